@@ -1,2 +1,3 @@
 from .detect_audio import *
 from .detect_image import *
+from .inference_queue import *
@@ -2,17 +2,21 @@ import csv
 import os
 from datetime import timedelta
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 
 # ONLY ENABLE WHEN ON GOOGLE CLOUD FUNCTIONS
 # import functions_framework
-import pandas as pd
 from flask import Request, make_response
-from google.cloud import speech_v1p1beta1 as speech
 from google.cloud import storage
 
+from ai_utils.speech import CHUNK_WORKERS, GoogleRecognizer, iter_audio_violations, split_audio
+from ai_utils.text.lexicon import GCSLexiconSource, Lexicon
+
 CLOUD_BUCKET = str(os.getenv("GOOGLE_STORAGE_BUCKET_NAME"))
 
+# Loaded once per process (or warm function instance) and downloaded again only when the blob changes
+BLACKLISTED_WORDS = Lexicon(GCSLexiconSource(CLOUD_BUCKET, "static/abusive.csv"))
+
 def convert_duration_to_seconds(duration_time):
     if isinstance(duration_time, timedelta):
         return duration_time.total_seconds()
@@ -21,47 +25,27 @@ def convert_duration_to_seconds(duration_time):
         return hours * 3600 + minutes * 60 + seconds
 
 def get_blacklisted_words():
-    df = pd.read_csv(f'gs://{CLOUD_BUCKET}/static/abusive.csv')
-    df_us = pd.read_csv(f'gs://{CLOUD_BUCKET}/static/abusive.csv', header = None)
+    return BLACKLISTED_WORDS.words()
+
 
-    df_us_lower = df_us.applymap(lambda x: x.lower() if isinstance(x, str) else x)
-    list_data_us = df_us_lower[0].tolist()
-    list_data = df['ABUSIVE'].tolist()
-    list_data.extend(list_data_us)
-    blacklisted_words = list_data
-    return blacklisted_words
+def iter_transcribe_gcs(audio_path, recognizer=None, workers=CHUNK_WORKERS):
+    """Transcribe the audio file in overlapping chunks concurrently, yielding violations as chunks complete.
+
+    The file is downloaded and split into CHUNK_SECONDS chunks, which are transcribed by
+    `workers` concurrent recognize calls (Google Speech-to-Text unless another recognizer is
+    given), so a long recording is no longer one operation bound by a single timeout.
+    """
+    recognizer = recognizer or GoogleRecognizer()
+    with TemporaryDirectory() as temp_dir:
+        local_path = os.path.join(temp_dir, Path(str(audio_path).split('/')[-1]).name)
+        storage.Client().bucket(CLOUD_BUCKET).blob(audio_path).download_to_filename(local_path)
+        chunks = split_audio(local_path, temp_dir)
+        yield from iter_audio_violations(chunks, recognizer, BLACKLISTED_WORDS, workers)
 
 
 def transcribe_gcs(audio_path):
     """Asynchronously transcribes the audio file specified by the gcs_uri."""
-    blacklisted_words_list = get_blacklisted_words()
-
-    filename = Path(str(audio_path).split('/')[-1])
-    filename_wo_ext = filename.with_suffix('')
-    
-    client_speech = speech.SpeechClient()
-
-    audio = speech.RecognitionAudio(uri=f'gs://{CLOUD_BUCKET}/{audio_path}')
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED,
-        sample_rate_hertz=16000,
-        enable_word_time_offsets=True,
-        language_code="id-ID",
-        alternative_language_codes=["en-ES", "en-US"]
-    )
-
-    operation = client_speech.long_running_recognize(config=config, audio=audio)
-
-    response = operation.result(timeout=1800)
-            
-    violations = []
-    for result in response.results:
-        for word in result.alternatives[0].words:
-            if word.word in blacklisted_words_list:
-                start_time = convert_duration_to_seconds(word.start_time)
-                violations.append({"word": word.word, "time": start_time})
-                        
-    return violations
+    return list(iter_transcribe_gcs(audio_path))
 
 
 # ONLY ENABLE WHEN ON GOOGLE CLOUD FUNCTIONS
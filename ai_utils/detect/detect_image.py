@@ -2,6 +2,7 @@ import logging
 import pathlib
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 CURR_DIR = pathlib.Path.cwd()
 sys.path.append(str(CURR_DIR))
@@ -18,6 +19,8 @@ import tensorflow as tf
 from PIL import Image
 from utils import label_map_util
 
+from ai_utils.detect.model_registry import ModelRegistry
+from ai_utils.storage import FrameStore
 from app.dto import FrameResult, ModerationDecision, ModerationResult
 from config import UPLOAD_PATH
 
@@ -25,6 +28,22 @@ from config import UPLOAD_PATH
 tf.gfile = tf.io.gfile
 logger = logging.getLogger(__name__)
 
+DETECTION_BATCH_SIZE = 8
+VIOLATION_CATEGORIES = ["saru", "sadis", "sihir"]
+
+
+def image_to_array(image) -> np.ndarray:
+    """Return an image as a contiguous H×W×3 uint8 RGB array without per-pixel Python objects.
+
+    PIL images are copied once from their pixel buffer. NumPy arrays (e.g. frames decoded in the
+    extraction stage, already converted to RGB) are passed straight through when they are uint8.
+    """
+    if isinstance(image, np.ndarray):
+        return np.ascontiguousarray(image, dtype=np.uint8)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image, dtype=np.uint8)
+
 
 class ObjectDetector(object):
     def __init__(self, category=None):
@@ -42,6 +61,13 @@ class ObjectDetector(object):
         print("Model is loaded!")
         model = model.signatures["serving_default"]
         self.model = model
+        self.max_batch_size = self.__max_batch_size()
+        if self.max_batch_size is not None and self.max_batch_size < DETECTION_BATCH_SIZE:
+            logger.warning(
+                f"Model {category} takes at most {self.max_batch_size} image(s) per call, so its frames are not "
+                f"batched by {DETECTION_BATCH_SIZE}. Export it with a dynamic batch dimension ([None, None, None, 3]) "
+                "to batch them."
+            )
 
         label_map = label_map_util.load_labelmap(parsed_label_path)
         categories = label_map_util.convert_label_map_to_categories(
@@ -49,89 +75,183 @@ class ObjectDetector(object):
         )
         self.category_index = label_map_util.create_category_index(categories)
 
-    def __load_image_into_numpy_array(self, image):
-        (im_width, im_height) = image.size
-        return (
-            np.array(image.getdata())
-            .reshape((im_height, im_width, 3))
-            .astype(np.uint8)
-        )
+    def __max_batch_size(self):
+        # Models exported with a fixed batch dimension (e.g. [1, None, None, 3]) only take one image per call
+        _, input_specs = self.model.structured_input_signature
+        input_spec = next(iter(input_specs.values()))
+        return input_spec.shape[0]
+
+    def __split_outputs(self, output_dict, index):
+        num_detections = int(output_dict["num_detections"][index])
+        classes = output_dict["detection_classes"][index, :num_detections].astype(np.int64)
+        scores = output_dict["detection_scores"][index, :num_detections]
+        return scores, classes, num_detections
 
     def detect(self, image):
-        image_np = self.__load_image_into_numpy_array(image)
-        input_tensor = tf.convert_to_tensor(image_np)
-        input_tensor = input_tensor[tf.newaxis, ...]
-        output_dict = self.model(input_tensor)
-
-        num_detections = int(output_dict.pop("num_detections"))
-        output_dict = {
-            key: value[0, :num_detections].numpy()
-            for key, value in output_dict.items()
-        }
-        classes = output_dict["detection_classes"].astype(np.int64)
-        scores = output_dict["detection_scores"]
-
-        # free up memory by deleting heavy objects after use
-        del image_np
-        del input_tensor
-        del output_dict
+        return self.detect_batch([image])[0]
 
-        return scores, classes, num_detections
+    def detect_batch(self, images, batch_size=DETECTION_BATCH_SIZE):
+        """Run the model on a list of images and return (scores, classes, num_detections) per image.
+
+        Images may be PIL images or RGB uint8 NumPy arrays, see image_to_array.
+
+        Images of the same size are stacked and sent to the serving signature together, at most
+        batch_size (or the model's own batch limit) at a time. Results keep the input order.
+        """
+        if self.max_batch_size is not None:
+            batch_size = min(batch_size, self.max_batch_size)
+
+        images_np = [image_to_array(image) for image in images]
+        groups: Dict[tuple, List[int]] = {}
+        for index, image_np in enumerate(images_np):
+            groups.setdefault(image_np.shape, []).append(index)
+
+        results = [None] * len(images_np)
+        for indexes in groups.values():
+            for start in range(0, len(indexes), batch_size):
+                batch_indexes = indexes[start : start + batch_size]
+                input_tensor = tf.convert_to_tensor(
+                    np.stack([images_np[index] for index in batch_indexes])
+                )
+                output_dict = self.model(input_tensor)
+                output_dict = {key: value.numpy() for key, value in output_dict.items()}
+                for position, index in enumerate(batch_indexes):
+                    results[index] = self.__split_outputs(output_dict, position)
+
+                # free up memory by deleting heavy objects after use
+                del input_tensor
+                del output_dict
+
+        del images_np
+        return results
+
+
+# Loaded models are kept for the lifetime of the process and shared by every job it runs
+MODEL_REGISTRY = ModelRegistry(ObjectDetector)
 
 
-def detect_objects(frame_results: List[FrameResult]) -> List[ModerationResult]:
-    violation_categories = ["saru", "sadis", "sihir"]
+def preload_models(categories: List[str] = VIOLATION_CATEGORIES):
+    """Load every category model into the registry, e.g. when a worker starts."""
+    MODEL_REGISTRY.preload(categories)
+    return MODEL_REGISTRY.get_stats()
 
+
+def __load_frame(
+    frame_result: FrameResult, frame_store: FrameStore = None, store_key: str = None, frame_dir: str = UPLOAD_PATH
+) -> np.ndarray:
+    if frame_store is not None:
+        frame = frame_store.get(store_key, frame_result["frame_url"])
+        if frame is not None:
+            return image_to_array(frame)
+    saved_file = f"{frame_dir}/{frame_result['frame_url'].split('/')[-1]}"
+    with Image.open(saved_file) as image:
+        return image_to_array(image)
+
+
+def __merge_detections(
+    results: Dict[str, ModerationResult],
+    frame_result: FrameResult,
+    category: str,
+    client: ObjectDetector,
+    model_scores,
+    model_classes,
+):
+    # check whether current frame detections has any score >= 0.8
+    detected_indexes = []
+    for index, score in enumerate(model_scores):
+        if score >= 0.8:
+            detected_indexes.append(index)
+
+    if len(detected_indexes) > 0:
+        if results.get(frame_result["frame_url"]) is None:
+            results[frame_result["frame_url"]] = ModerationResult(
+                second=frame_result["frame_time"],
+                clip_url="",
+                decision=str(ModerationDecision.PENDING),
+                category=[category.upper()],
+                label=[],
+            )
+
+    for result_index in detected_indexes:
+        existing_category = results[frame_result["frame_url"]].category
+        if category.upper() not in existing_category:
+            results[frame_result["frame_url"]].category.append(category.upper())
+
+        detected_label = client.category_index[model_classes[result_index]][
+            "name"
+        ].lower()
+        existing_label = results[frame_result["frame_url"]].label
+        if detected_label not in existing_label:
+            results[frame_result["frame_url"]].label.append(detected_label)
+        logger.error(results[frame_result["frame_url"]])
+
+
+def detect_objects(
+    frame_results: List[FrameResult],
+    batch_size: int = DETECTION_BATCH_SIZE,
+    concurrent_models: bool = True,
+    frame_store: FrameStore = None,
+    store_key: str = None,
+    frame_dir: str = UPLOAD_PATH,
+) -> List[ModerationResult]:
+    """Detect violations in the given frames with every category model.
+
+    Each batch of frames is decoded once and shared by all category models, which run
+    concurrently on it when concurrent_models is set. Detections are merged in category
+    order, so categories and labels come out in the same order as a category-by-category run.
+    Frames found in the frame_store under store_key are read from it as they were decoded by the
+    extraction, the others from their downloaded JPEG in frame_dir.
+    """
     process = psutil.Process()
+    clients = {category: MODEL_REGISTRY.get(category) for category in VIOLATION_CATEGORIES}
+    inference_time = {category: 0.0 for category in VIOLATION_CATEGORIES}
+
+    def run_detection(category, images):
+        category_start_time = time.time()
+        detections = clients[category].detect_batch(images, batch_size)
+        inference_time[category] += time.time() - category_start_time
+        return detections
+
+    initial_memory = process.memory_info().rss / (1024 * 1024)
+    start_time = time.time()
     results: Dict[str, ModerationResult] = {}
-    for category in violation_categories:
-        client = ObjectDetector(category)
-        initial_memory = process.memory_info().rss / (1024 * 1024)
-        start_time = time.time()
-        for frame_result in frame_results:
-            saved_file = (
-                f"{UPLOAD_PATH}/{frame_result['frame_url'].split('/')[-1]}"
-            )
-            with Image.open(saved_file).convert("RGB") as image:
-                model_scores, model_classes, _ = client.detect(image)
-
-            # free up memory by deleting image from memory after use
-            del image
-
-            # check whether current frame detections has any score >= 0.8
-            detected_indexes = []
-            for index, score in enumerate(model_scores):
-                if score >= 0.8:
-                    detected_indexes.append(index)
-
-            if len(detected_indexes) > 0:
-                if results.get(frame_result["frame_url"]) is None:
-                    results[frame_result["frame_url"]] = ModerationResult(
-                        second=frame_result["frame_time"],
-                        clip_url="",
-                        decision=str(ModerationDecision.PENDING),
-                        category=[category.upper()],
-                        label=[],
-                    )
+    max_workers = len(clients) if concurrent_models else 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(frame_results), batch_size):
+            batch_frames = frame_results[start : start + batch_size]
+            images = [
+                __load_frame(frame_result, frame_store, store_key, frame_dir) for frame_result in batch_frames
+            ]
+            futures = {
+                category: executor.submit(run_detection, category, images)
+                for category in VIOLATION_CATEGORIES
+            }
 
-            for result_index in detected_indexes:
-                existing_category = results[frame_result["frame_url"]].category
-                if category.upper() not in existing_category:
-                    results[frame_result["frame_url"]].category.append(
-                        category.upper()
+            for category in VIOLATION_CATEGORIES:
+                detections = futures[category].result()
+                for frame_result, (model_scores, model_classes, _) in zip(
+                    batch_frames, detections
+                ):
+                    __merge_detections(
+                        results,
+                        frame_result,
+                        category,
+                        clients[category],
+                        model_scores,
+                        model_classes,
                     )
-                
-                detected_label = client.category_index[model_classes[result_index]][
-                        "name"
-                    ].lower()
-                existing_label = results[frame_result["frame_url"]].label
-                if detected_label not in existing_label:
-                    results[frame_result["frame_url"]].label.append(detected_label)
-                logger.error(results[frame_result["frame_url"]])
-        final_memory = process.memory_info().rss / (1024 * 1024)
+
+            # free up memory by deleting images from memory after use
+            del images
+
+    final_memory = process.memory_info().rss / (1024 * 1024)
+    for category in VIOLATION_CATEGORIES:
         logger.info(
-            f"Detection of {category} took {time.time() - start_time} seconds and uses {final_memory - initial_memory} MB of memory."
+            f"Inference of {category} took {inference_time[category]} seconds."
         )
+    logger.info(
+        f"Detection of {len(frame_results)} frames took {time.time() - start_time} seconds and uses {final_memory - initial_memory} MB of memory."
+    )
 
     results_list = list(results.values())
     results_list.sort(key=lambda x: x.second)
@@ -0,0 +1,99 @@
+import logging
+import time
+from typing import List
+
+from rq import Queue
+from rq.job import Job, JobStatus
+
+from ai_utils.detect.detect_image import DETECTION_BATCH_SIZE, detect_objects
+from ai_utils.storage import FrameStore
+from app.dto import FrameResult, ModerationResult
+from config import UPLOAD_PATH
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_JOB_FRAMES = 64
+INFERENCE_JOB_TIMEOUT = 3600
+INFERENCE_POLL_INTERVAL = 1.0
+
+
+def submit_detection(
+    frame_results: List[FrameResult],
+    queue: Queue,
+    job_frames: int = INFERENCE_JOB_FRAMES,
+    batch_size: int = DETECTION_BATCH_SIZE,
+    frame_store: FrameStore = None,
+    store_key: str = None,
+    frame_dir: str = UPLOAD_PATH,
+) -> List[Job]:
+    """Enqueue detection of the given frames on the inference queue, `job_frames` frames per job.
+
+    The jobs run detect_objects in an inference worker that keeps the models loaded, so several
+    inference workers can share the frames of one video. The frames must already be downloaded
+    to frame_dir, or saved in the frame_store, on a filesystem the inference workers can read.
+    """
+    jobs = []
+    for start in range(0, len(frame_results), job_frames):
+        job = queue.enqueue_call(
+            func=detect_objects,
+            args=(frame_results[start : start + job_frames], batch_size, True, frame_store, store_key, frame_dir),
+            timeout=INFERENCE_JOB_TIMEOUT,
+        )
+        logger.info(
+            "Job %s queued || Detect Frames %s to %s",
+            job.id,
+            start,
+            start + len(job.args[0]) - 1,
+        )
+        jobs.append(job)
+    return jobs
+
+
+def wait_for_detection(
+    jobs: List[Job],
+    timeout: float = INFERENCE_JOB_TIMEOUT,
+    poll_interval: float = INFERENCE_POLL_INTERVAL,
+) -> List[ModerationResult]:
+    """Wait for the detection jobs and return their results merged and sorted by second.
+
+    Raises an exception when a job fails, or cancels the unfinished jobs and raises when they are
+    not done within `timeout` seconds, e.g. because no inference worker is running.
+    """
+    deadline = time.time() + timeout
+    results: List[ModerationResult] = []
+    for job in jobs:
+        while True:
+            status = job.get_status()
+            if status == JobStatus.FINISHED:
+                results.extend(job.result)
+                break
+            if status in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED):
+                raise Exception(f"Inference job {job.id} {status}")
+            if time.time() > deadline:
+                for unfinished in jobs:
+                    if unfinished.get_status() not in (JobStatus.FINISHED, JobStatus.FAILED):
+                        unfinished.cancel()
+                raise Exception(f"Inference job {job.id} timed out after {timeout} seconds")
+            time.sleep(poll_interval)
+
+    results.sort(key=lambda x: x.second)
+    return results
+
+
+def detect_objects_remote(
+    frame_results: List[FrameResult],
+    queue: Queue,
+    job_frames: int = INFERENCE_JOB_FRAMES,
+    batch_size: int = DETECTION_BATCH_SIZE,
+    frame_store: FrameStore = None,
+    store_key: str = None,
+    frame_dir: str = UPLOAD_PATH,
+) -> List[ModerationResult]:
+    """Run detect_objects on the inference workers listening on `queue` and wait for the results."""
+    start_time = time.time()
+    jobs = submit_detection(frame_results, queue, job_frames, batch_size, frame_store, store_key, frame_dir)
+    results = wait_for_detection(jobs)
+    logger.info(
+        f"Remote detection of {len(frame_results)} frames in {len(jobs)} jobs took {time.time() - start_time} seconds."
+    )
+    return results
@@ -0,0 +1,55 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry(object):
+    """Process-wide cache of loaded models, keyed by category.
+
+    Every category is loaded at most once per process with the given loader and reused by
+    every later caller (and every later RQ job when the worker does not fork per job).
+    Load time and resident memory growth are recorded per category.
+    """
+
+    def __init__(self, loader: Callable[[str], object]):
+        self.loader = loader
+        self.models: Dict[str, object] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, category: str) -> object:
+        model = self.models.get(category)
+        if model is not None:
+            return model
+
+        with self.lock:
+            if category not in self.models:
+                self.models[category] = self.__load(category)
+            return self.models[category]
+
+    def preload(self, categories: List[str]):
+        for category in categories:
+            self.get(category)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {category: stats.copy() for category, stats in self.stats.items()}
+
+    def __load(self, category: str) -> object:
+        process = psutil.Process()
+        initial_memory = process.memory_info().rss / (1024 * 1024)
+        start_time = time.time()
+
+        model = self.loader(category)
+
+        load_seconds = time.time() - start_time
+        memory_mb = process.memory_info().rss / (1024 * 1024) - initial_memory
+        self.stats[category] = {"load_seconds": load_seconds, "memory_mb": memory_mb}
+        logger.info(
+            f"Model {category} loaded in {load_seconds} seconds and uses {memory_mb} MB of memory."
+        )
+        return model
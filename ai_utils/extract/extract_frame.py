@@ -1,7 +1,7 @@
 import os
 import time
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from tempfile import TemporaryDirectory
 
 import cv2
 
@@ -13,6 +13,14 @@ from flask import Request, make_response
 from google.cloud import storage
 from PIL import Image
 
+from ai_utils.extract.ffmpeg_source import ffmpeg_color_frames, ffmpeg_gray_frames
+from ai_utils.extract.frame_scoring import SCORING_BATCH_SIZE, blur_frame, score_frames
+from ai_utils.extract.frame_sampler import open_video, retrieve_sampled_frames, sample_frames
+from ai_utils.extract.keyframe_upload import UPLOAD_WORKERS, publish_keyframes
+from ai_utils.extract.parallel_extract import parallel_score_frames
+
+FRAME_SOURCES = ["opencv", "ffmpeg"]
+
 
 def __scale(img, x_scale, y_scale):
     """Resize the input image using the provided scaling factors."""
@@ -45,99 +53,112 @@ def __average_pixels(path):
     return (r / count), (g / count), (b / count), count
 
 
-def __convert_frame_to_grayscale(frame):
-    """Convert the input frame to grayscale and apply Gaussian blur."""
-    gray_frame = None
-    gray = None
-    if frame is not None:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray_frame = gray.copy()
-        gray = cv2.GaussianBlur(gray, (9, 9), 0.0)
-    return gray_frame, gray
+def __video_path(user_id, filename, source, video_path=None, workdir=None):
+    """Return a local path of the video and the temporary directory to clean up afterwards, if any.
 
+    A local video_path (e.g. from the media cache) is used as it is. Otherwise the source blob is
+    downloaded into workdir, or into a private temporary directory when no workdir is given, so
+    concurrent extractions on one host never share a file.
+    """
+    if video_path is not None:
+        print("Using local video")
+        return video_path, None
+    if Path.cwd().joinpath("uploads", f"{user_id}_{filename}").exists():
+        print("File Exists")
+        return Path.cwd().joinpath("uploads", f"{user_id}_{filename}"), None
+    temp_dir = None
+    if workdir is None:
+        temp_dir = TemporaryDirectory()
+        workdir = temp_dir.name
+    video_path = os.path.join(workdir, 'video.mp4')
+    source.download_to_filename(video_path)
+    return video_path, temp_dir
+
+
+def keyframe_detection(user_id, filename, source, dest, threshold, plot_metrics=False, verbose=False, sampler="sequential", streaming=True, frame_source="opencv", batch_size=SCORING_BATCH_SIZE, workers=1, upload_workers=UPLOAD_WORKERS, video_path=None, workdir=None):
+    """Detect keyframes in the input video and publish them to the destination, see publish_keyframes.
+
+    The sampler selects how one frame per second is read: "sequential" decodes the
+    stream once in order, "seek" seeks to every sampled second (legacy behaviour).
+    In streaming mode only the diff magnitudes are kept in memory and the keyframes
+    are decoded again in a second pass, so memory does not grow with video length.
+    frame_source selects the decoder, see FRAME_SOURCES and ffmpeg_gray_frames, and workers > 1
+    scores time segments in a process pool (see parallel_score_frames). The video is read from
+    video_path when given, see __video_path for where it comes from otherwise.
+    """
+    if frame_source not in FRAME_SOURCES:
+        raise ValueError(f"Unknown frame source '{frame_source}', expected one of {FRAME_SOURCES}")
 
-def keyframe_detection(user_id, filename, source, dest, threshold, plot_metrics=False, verbose=False):
-    """Detect keyframes in the input video and upload them to the destination bucket."""
     filename = Path(str(filename))
     print(filename)
     filename_wo_ext = filename.with_suffix('')
 
     folder_path = f"moderation/{user_id}/{filename_wo_ext}/frames"
 
-    video_path = None
-    if(Path.cwd().joinpath("uploads", f"{user_id}_{filename}").exists()):
-        print("File Exists")
-        video_path = Path.cwd().joinpath("uploads", f"{user_id}_{filename}")
-    else:
-        source.download_to_filename('/tmp/video.mp4')
-        video_path = '/tmp/video.mp4'
-    cap = cv2.VideoCapture(str(video_path))
-    length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-
-    if not cap.isOpened():
-        print("Error opening video file")
+    video_path, temp_dir = __video_path(user_id, filename, source, video_path, workdir)
+    cap, length, fps = open_video(video_path)
+
+    if not cap.isOpened() or fps <= 0:
+        print("Error opening video file" if not cap.isOpened() else f"Video file reports {fps} fps")
+        cap.release()
+        if temp_dir is not None:
+            temp_dir.cleanup()
         return []
 
-    list_diff_mag = []
-    time_spans = []
-    images = []
     full_color = []
-    last_frame = None
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    # The ffmpeg source keeps the sampled frames as files, so the keyframes are not decoded again
+    color_dir = TemporaryDirectory(dir=workdir) if frame_source == "ffmpeg" else None
+
+    def blurred_frames():
+        if frame_source == "ffmpeg":
+            for curr_iter, gray in ffmpeg_gray_frames(video_path, width, height, color_dir=color_dir.name):
+                yield curr_iter, cv2.GaussianBlur(gray, (9, 9), 0.0)
+            return
+        for curr_iter, frame in sample_frames(cap, fps, length, sampler):
+            if not streaming:
+                full_color.append(frame)
+            yield curr_iter, blur_frame(frame)
 
     print(f"length {length}")
     print(f"fps {fps}")
-    curr_iter = 0
-    while (curr_iter * fps) <= length:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, curr_iter * fps)
-        _, frame = cap.read()
-
-        gray_frame, blur_gray = __convert_frame_to_grayscale(frame)
-
-        frame_number = cap.get(cv2.CAP_PROP_POS_FRAMES) - 1
-        images.append(gray_frame)
-        full_color.append(frame)
-        if frame_number == 0:
-            last_frame = blur_gray
-
-        if last_frame is not None and blur_gray is not None and last_frame.shape != blur_gray.shape:
-            blur_gray = cv2.resize(blur_gray, (last_frame.shape[1], last_frame.shape[0]), interpolation=cv2.INTER_AREA)
-            
-        try:
-            diff = cv2.subtract(blur_gray, last_frame)
-        except Exception as err:
-            print(err)
-            print(frame_number, blur_gray, last_frame)
-        diff_mag = cv2.countNonZero(diff)
-        list_diff_mag.append(diff_mag)
-        time_spans.append(curr_iter)
-        last_frame = blur_gray
-        curr_iter += 1
+    if frame_source == "opencv" and workers > 1:
+        streaming = True
+        time_spans, list_diff_mag = parallel_score_frames(video_path, length, fps, workers, batch_size)
+    else:
+        time_spans, list_diff_mag = score_frames(blurred_frames(), batch_size=batch_size)
 
     cap.release()
     y = np.array(list_diff_mag)
     base = peakutils.baseline(y, 2)
     indices = peakutils.indexes(y - base, threshold, min_dist=1)
 
-    results = []
-    for index, elem in enumerate(indices):
-        with NamedTemporaryFile(suffix='.jpg') as temp:
-            status = cv2.imwrite(temp.name, full_color[elem])
-            if status:
-                print('Image uploaded.')
-            else:
-                print("Image upload failed.")
+    if frame_source == "ffmpeg":
+        peak_seconds = [time_spans[elem] for elem in indices]
+        keyframes = (frame for _, frame in ffmpeg_color_frames(color_dir.name, peak_seconds))
+    elif streaming:
+        # Second pass: decode again and keep only the frames at the detected peaks
+        cap, _, _ = open_video(video_path)
+        keyframes = (frame for _, frame in retrieve_sampled_frames(cap, fps, [time_spans[elem] for elem in indices]))
+    else:
+        keyframes = (full_color[elem] for elem in indices)
+
+    def numbered_keyframes():
+        for index, (elem, keyframe) in enumerate(zip(indices, keyframes)):
             log_message = f"Keyframe {index+1} happened at {time_spans[elem]} sec."
             print(log_message)
             keyframe_path = f"{folder_path}/{filename_wo_ext}_{index+1}.jpg"
-            results.append({"frame_url": keyframe_path, "frame_time": round(time_spans[elem], 2)})
-            dest_blob = dest.blob(keyframe_path)
-            dest_blob.upload_from_filename(temp.name, content_type='image/jpeg')
-            dest_blob.make_public()
-            print(f"Uploaded {dest_blob}")
-
-    if os.path.exists('/tmp/video.mp4'):
-        os.remove('/tmp/video.mp4')
+            yield keyframe_path, round(time_spans[elem], 2), keyframe
+
+    results = publish_keyframes(dest, numbered_keyframes(), upload_workers)
+
+    cap.release()
+
+    if color_dir is not None:
+        color_dir.cleanup()
+    if temp_dir is not None:
+        temp_dir.cleanup()
 
     return results
 
@@ -0,0 +1,90 @@
+import os
+import subprocess
+from itertools import count
+
+import cv2
+import numpy as np
+
+GRAY_FRAME_WIDTH = 320
+RING_BUFFER_SIZE = 8
+# ffmpeg -q:v of the sampled full-resolution frames, 2 is the best quality
+COLOR_JPEG_QUALITY = 2
+
+
+def __read_exact(stream, buffer):
+    """Fill the buffer from the stream, returning False when the stream ends first."""
+    view = memoryview(buffer).cast("B")
+    read = 0
+    while read < len(view):
+        size = stream.readinto(view[read:])
+        if not size:
+            return False
+        read += size
+    return True
+
+
+def __run_ffmpeg(command, frame_shape, seconds, buffer_size):
+    """Run ffmpeg and yield raw frames of the given shape read into a ring buffer."""
+    ring = np.empty((buffer_size, *frame_shape), dtype=np.uint8)
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+    try:
+        exhausted = False
+        for index, second in enumerate(seconds):
+            slot = ring[index % buffer_size]
+            if not exhausted and not __read_exact(process.stdout, slot):
+                exhausted = True
+            yield second, None if exhausted else slot
+    finally:
+        # Once the frames are exhausted, ffmpeg is left to finish its other outputs
+        if not exhausted and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def scaled_size(width, height, scale_width=GRAY_FRAME_WIDTH):
+    """Return the (width, height) of a frame scaled to `scale_width`, keeping the aspect ratio even."""
+    scale_width = min(scale_width, width)
+    scale_height = max(2, int(round(height * scale_width / width / 2)) * 2)
+    return scale_width, scale_height
+
+
+def ffmpeg_gray_frames(video_path, width, height, scale_width=GRAY_FRAME_WIDTH, color_dir=None, buffer_size=RING_BUFFER_SIZE):
+    """Yield one small grayscale (second, frame) pair per second, decoded and downscaled by ffmpeg.
+
+    ffmpeg does the sampling (fps=1), resizing and grayscale conversion, and the raw frames are
+    piped into a ring buffer. Yielded frames are views into that buffer, so a consumer that keeps
+    a frame for more than `buffer_size - 1` iterations must copy it.
+
+    Decoding costs as much as it does for OpenCV, since every frame still has to be decoded. With
+    color_dir the same ffmpeg process also writes every sampled second at full resolution as
+    <second>.jpg into that directory, so the keyframes are read back with `ffmpeg_color_frames`
+    instead of decoding the video a second time.
+    """
+    scale_width, scale_height = scaled_size(width, height, scale_width)
+    gray_filter = f"scale={scale_width}:{scale_height}:flags=area,format=gray"
+    if color_dir is None:
+        outputs = ["-vf", f"fps=1,{gray_filter}", "-f", "rawvideo", "-pix_fmt", "gray", "-"]
+    else:
+        outputs = [
+            "-filter_complex", f"[0:v]fps=1,split[gray][color];[gray]{gray_filter}[small]",
+            "-map", "[small]", "-f", "rawvideo", "-pix_fmt", "gray", "-",
+            "-map", "[color]", "-q:v", str(COLOR_JPEG_QUALITY), "-start_number", "0", os.path.join(str(color_dir), "%d.jpg"),
+        ]
+    command = ["ffmpeg", "-loglevel", "error", "-i", str(video_path), "-an", *outputs]
+    frames = __run_ffmpeg(command, (scale_height, scale_width), count(), buffer_size)
+    for second, frame in frames:
+        if frame is None:
+            break
+        yield second, frame
+
+
+def ffmpeg_color_frames(color_dir, seconds):
+    """Yield full-resolution BGR (second, frame) pairs for the requested sampled seconds only.
+
+    The frames are read from the JPEG files `ffmpeg_gray_frames` wrote into color_dir. Seconds
+    past the end of the stream have no file and yield None.
+    """
+    for second in sorted(set(seconds)):
+        frame_path = os.path.join(str(color_dir), f"{second}.jpg")
+        yield second, cv2.imread(frame_path) if os.path.exists(frame_path) else None
@@ -0,0 +1,79 @@
+import cv2
+
+
+def open_video(video_path):
+    """Open the input video and return the capture together with its frame count and fps."""
+    cap = cv2.VideoCapture(str(video_path))
+    length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    return cap, length, fps
+
+
+def seek_sampled_frames(cap, fps, length):
+    """Yield one (second, frame) pair per second by seeking to every sampled position.
+
+    Every seek makes the decoder jump back to the previous keyframe and decode forward,
+    so this sampler is kept only as a reference for the sequential one.
+    """
+    curr_iter = 0
+    while (curr_iter * fps) <= length:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, curr_iter * fps)
+        _, frame = cap.read()
+        yield curr_iter, frame
+        curr_iter += 1
+
+
+def sequential_sampled_frames(cap, fps, length):
+    """Yield one (second, frame) pair per second by decoding the stream once, in order.
+
+    Every frame is grabbed but only the sampled ones are retrieved (converted to BGR).
+    Seconds past the end of the stream yield None, exactly like a failed read in the
+    seeking sampler, so both samplers produce the same series.
+    """
+    return retrieve_sampled_frames(cap, fps, range(length // fps + 1))
+
+
+SAMPLERS = {
+    "seek": seek_sampled_frames,
+    "sequential": sequential_sampled_frames,
+}
+
+
+def sample_frames(cap, fps, length, sampler="sequential"):
+    """Yield one (second, frame) pair per second of video using the selected sampler."""
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Unknown frame sampler '{sampler}', expected one of {list(SAMPLERS)}")
+    return SAMPLERS[sampler](cap, fps, length)
+
+
+def retrieve_sampled_frames(cap, fps, seconds, first_frame=0):
+    """Yield (second, frame) pairs for the requested seconds only, decoding the stream once, in order.
+
+    Decoding stops after the last requested second. Seconds past the end of the stream yield None.
+    first_frame is the index of the next frame the capture will decode, when it has been seeked.
+    """
+    targets = sorted(set(seconds))
+    frame_index = first_frame
+    exhausted = False
+    for second in targets:
+        target = second * fps
+        frame = None
+        while not exhausted and frame_index <= target:
+            if not cap.grab():
+                exhausted = True
+                break
+            if frame_index == target:
+                _, frame = cap.retrieve()
+            frame_index += 1
+        yield second, frame
+
+
+def segment_sampled_frames(cap, fps, start_second, end_second):
+    """Yield (second, frame) pairs for the seconds in [start_second, end_second).
+
+    The capture seeks once to the start of the segment and decodes in order from there.
+    """
+    first_frame = start_second * fps
+    if first_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+    return retrieve_sampled_frames(cap, fps, range(start_second, end_second), first_frame)
@@ -0,0 +1,174 @@
+import threading
+from queue import Empty, Queue
+
+import cv2
+import numpy as np
+
+SCORING_BATCH_SIZE = 64
+SCORING_CHUNK_SIZE = 4
+PREFETCH_DEPTH = 2
+
+
+def blur_frame(frame):
+    """Convert a BGR frame to grayscale and apply the 9×9 Gaussian blur used for scoring."""
+    if frame is None:
+        return None
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(gray, (9, 9), 0.0)
+
+
+def diff_magnitudes(frames, previous=None, chunk_size=SCORING_CHUNK_SIZE):
+    """Return the diff magnitude of every frame in an N×H×W uint8 stack.
+
+    The diff magnitude of a frame is the number of pixels that got brighter than in the frame
+    before it, which is what cv2.countNonZero(cv2.subtract(frame, last_frame)) computes. The first
+    frame is compared with `previous`, or with itself when there is none. Frames are compared
+    `chunk_size` at a time (None compares the whole stack at once) into a reused mask buffer, which
+    keeps the working set small enough to stay in cache, and every chunk is counted in one
+    cv2.reduce over its rows, so there is no Python loop over frames.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    count = len(frames)
+    magnitudes = np.zeros(count, dtype=np.int64)
+    if count == 0:
+        return magnitudes
+
+    if previous is not None:
+        magnitudes[0] = cv2.countNonZero(cv2.compare(frames[0], previous, cv2.CMP_GT))
+    height, width = frames.shape[1:]
+    chunk_size = chunk_size or count
+    brighter = np.empty((min(chunk_size, count) * height, width), dtype=np.uint8)
+    for start in range(1, count, chunk_size):
+        end = min(start + chunk_size, count)
+        rows = (end - start) * height
+        mask = cv2.compare(
+            frames[start:end].reshape(rows, width),
+            frames[start - 1:end - 1].reshape(rows, width),
+            cv2.CMP_GT,
+            dst=brighter[:rows],
+        )
+        # Sum every row of the 255/0 mask, then the rows of every frame, which never overflows int32
+        row_counts = cv2.reduce(mask, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)
+        magnitudes[start:end] = row_counts.reshape(end - start, height).sum(axis=1) // 255
+    return magnitudes
+
+
+def batch_frames(blurred_frames, batch_size=SCORING_BATCH_SIZE):
+    """Group (second, frame) pairs into (seconds, N×H×W array) batches.
+
+    Every frame is resized to the shape of the first frame if needed. A missing frame (None) is
+    yielded on its own as ([second], None) so the scorer can handle it.
+    """
+    shape = None
+    seconds = []
+    batch = None
+    for second, frame in blurred_frames:
+        if frame is None:
+            if len(seconds) > 0:
+                yield seconds, batch[:len(seconds)]
+                seconds, batch = [], None
+            yield [second], None
+            continue
+
+        if shape is None:
+            shape = frame.shape
+        if frame.shape != shape:
+            frame = cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+        if batch is None:
+            batch = np.empty((batch_size, *shape), dtype=np.uint8)
+        batch[len(seconds)] = frame
+        seconds.append(second)
+        if len(seconds) == batch_size:
+            yield seconds, batch
+            seconds, batch = [], None
+
+    if len(seconds) > 0:
+        yield seconds, batch[:len(seconds)]
+
+
+def prefetch(iterable, depth=PREFETCH_DEPTH):
+    """Run the iterable in a background thread and yield its items through a bounded queue.
+
+    This lets decoding (which releases the GIL in OpenCV/ffmpeg) overlap with scoring.
+    Exceptions raised by the iterable are re-raised in the consuming thread.
+    """
+    queue = Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+    error = []
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                queue.put(item)
+        except Exception as err:
+            error.append(err)
+        finally:
+            queue.put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    finished = False
+    try:
+        while True:
+            item = queue.get()
+            if item is done:
+                finished = True
+                break
+            yield item
+    finally:
+        stop.set()
+        # When the consumer stops early, free the queue so a producer blocked on put() sees stop
+        while not finished and producer.is_alive():
+            try:
+                finished = queue.get(timeout=0.1) is done
+            except Empty:
+                continue
+        producer.join()
+    if len(error) > 0:
+        raise error[0]
+
+
+def fill_missing_magnitudes(list_diff_mag):
+    """Replace every missing (None) diff magnitude with the one before it, or 0 at the start."""
+    filled = []
+    for diff_mag in list_diff_mag:
+        if diff_mag is None:
+            diff_mag = filled[-1] if len(filled) > 0 else 0
+        filled.append(diff_mag)
+    return filled
+
+
+def score_frames(blurred_frames, batch_size=SCORING_BATCH_SIZE, chunk_size=SCORING_CHUNK_SIZE, pipelined=True, fill_missing=True):
+    """Score a stream of (second, blurred grayscale frame) pairs and return (time_spans, list_diff_mag).
+
+    Frames are stacked into batches and scored with diff_magnitudes. When pipelined, decoding and
+    batching run in a background thread while the previous batch is being scored. A missing frame
+    has no magnitude, and neither has the frame after it, like the per-frame loop when cv2.subtract
+    failed on a None frame. They are filled with the previous magnitude unless fill_missing is False.
+    """
+    batches = batch_frames(blurred_frames, batch_size)
+    if pipelined:
+        batches = prefetch(batches)
+
+    time_spans = []
+    list_diff_mag = []
+    previous = None
+    for seconds, batch in batches:
+        time_spans.extend(seconds)
+        if batch is None:
+            list_diff_mag.append(None)
+            previous = None
+            continue
+
+        magnitudes = diff_magnitudes(batch, previous, chunk_size).tolist()
+        if previous is None and len(list_diff_mag) > 0:
+            magnitudes[0] = None
+        list_diff_mag.extend(magnitudes)
+        previous = batch[-1].copy()
+
+    if fill_missing:
+        list_diff_mag = fill_missing_magnitudes(list_diff_mag)
+    return time_spans, list_diff_mag
@@ -0,0 +1,94 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+UPLOAD_WORKERS = 8
+
+
+def encode_keyframe(frame):
+    """Encode a BGR frame to JPEG in memory, returning the bytes or None when encoding fails."""
+    if frame is None:
+        return None
+    status, buffer = cv2.imencode(".jpg", frame)
+    return buffer.tobytes() if status else None
+
+
+def upload_keyframe(dest, keyframe_path, data):
+    """Upload encoded JPEG bytes to the destination bucket and make the blob public."""
+    dest_blob = dest.blob(keyframe_path)
+    dest_blob.upload_from_string(data, content_type='image/jpeg')
+    dest_blob.make_public()
+    print(f"Uploaded {dest_blob}")
+
+
+def upload_keyframes(dest, keyframes, workers=UPLOAD_WORKERS):
+    """Encode and upload (keyframe_path, frame_time, frame) keyframes, returning their results in order.
+
+    Frames are encoded as they arrive, so the keyframe iterable may reuse its frame buffers, and
+    the uploads run on a pool of `workers` threads. At most 2 × workers encoded frames wait for
+    an upload at any time. The destination only needs a `blob(name)` method returning an object
+    with `upload_from_string` and `make_public`, so a local fake can stand in for the bucket.
+    Keyframes that fail to encode are skipped.
+    """
+    results = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for keyframe_path, frame_time, frame in keyframes:
+            data = encode_keyframe(frame)
+            if data is None:
+                print(f"Encoding {keyframe_path} failed.")
+                continue
+            if len(pending) >= 2 * workers:
+                pending.popleft().result()
+            pending.append(executor.submit(upload_keyframe, dest, keyframe_path, data))
+            results.append({"frame_url": keyframe_path, "frame_time": frame_time})
+        for future in pending:
+            future.result()
+    return results
+
+
+class FrameStoreDestination(object):
+    """Keyframe destination that saves the keyframes in a frame store instead of uploading them.
+
+    The frames are kept under store_key as RGB arrays, for a detection on the same host to read
+    them as they were decoded; upload_stored_keyframes uploads them afterwards.
+    """
+
+    def __init__(self, frame_store, store_key):
+        self.frame_store = frame_store
+        self.store_key = store_key
+
+    def save_keyframes(self, keyframes):
+        """Save (keyframe_path, frame_time, frame) BGR keyframes, returning their results in order.
+
+        Keyframes without a frame are skipped, as upload_keyframes skips the ones that fail to encode.
+        """
+        results = []
+        for keyframe_path, frame_time, frame in keyframes:
+            if frame is None:
+                print(f"Keyframe {keyframe_path} has no frame.")
+                continue
+            self.frame_store.put(self.store_key, keyframe_path, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            results.append({"frame_url": keyframe_path, "frame_time": frame_time})
+        return results
+
+
+def publish_keyframes(dest, keyframes, workers=UPLOAD_WORKERS):
+    """Save the keyframes in a FrameStoreDestination, or upload them to any other destination."""
+    if isinstance(dest, FrameStoreDestination):
+        return dest.save_keyframes(keyframes)
+    return upload_keyframes(dest, keyframes, workers)
+
+
+def upload_stored_keyframes(dest, frame_store, store_key, frame_results, workers=UPLOAD_WORKERS):
+    """Upload keyframes saved in a frame store by keyframe_detection, returning their results in order."""
+    def stored_keyframes():
+        for frame_result in frame_results:
+            frame = frame_store.get(store_key, frame_result["frame_url"])
+            if frame is None:
+                print(f"Keyframe {frame_result['frame_url']} is not in the frame store.")
+                continue
+            yield frame_result["frame_url"], frame_result["frame_time"], cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+    return upload_keyframes(dest, stored_keyframes(), workers)
@@ -0,0 +1,87 @@
+import subprocess
+import tempfile
+import time
+
+import ffmpeg
+
+# Codecs that are copied into the mp4 as they are, anything else is encoded to H.264/AAC
+MP4_VIDEO_CODECS = {"h264"}
+MP4_AUDIO_CODECS = {"aac", "mp3"}
+
+
+def probe_media(source_path):
+    """Return the duration and the first video and audio codec names of a media file."""
+    probe = ffmpeg.probe(str(source_path))
+    codecs = {}
+    for stream in probe.get("streams", []):
+        codecs.setdefault(stream.get("codec_type"), stream.get("codec_name"))
+    return {
+        "duration": float(probe.get("format", {}).get("duration") or 0),
+        "video_codec": codecs.get("video"),
+        "audio_codec": codecs.get("audio"),
+    }
+
+
+def output_codecs(media):
+    """Return the ffmpeg (video, audio) encoders for the mp4 output, "copy" for compatible streams."""
+    video_codec = "copy" if media["video_codec"] in MP4_VIDEO_CODECS else "libx264"
+    audio_codec = "copy" if media["audio_codec"] in MP4_AUDIO_CODECS else "aac"
+    return video_codec, audio_codec
+
+
+def transcode_command(source_path, mp3_path, mp4_path=None, media=None):
+    """Build one ffmpeg command writing the mp3 audio and, when mp4_path is given, the mp4 video.
+
+    Streams whose codec already fits an mp4 container are copied instead of re-encoded. The
+    command reports its progress as key=value lines on stdout.
+    """
+    media = media or probe_media(source_path)
+    command = ["ffmpeg", "-y", "-v", "error", "-nostats", "-progress", "pipe:1", "-i", str(source_path)]
+    if mp4_path is not None:
+        video_codec, audio_codec = output_codecs(media)
+        command += [
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-c:v", video_codec, "-c:a", audio_codec,
+            "-movflags", "+faststart", str(mp4_path),
+        ]
+    command += ["-map", "0:a:0", "-vn", "-c:a", "libmp3lame", "-ar", "44100", str(mp3_path)]
+    return command
+
+
+def transcode_video_extract_audio(source_path, mp3_path, mp4_path=None, progress=None):
+    """Convert a video to mp4 (when mp4_path is given) and extract its mp3 audio in one ffmpeg run.
+
+    The source is decoded once for both outputs, and its video and audio streams are remuxed when
+    their codecs are already mp4 compatible. `progress` is called with the fraction done as ffmpeg
+    reports it. Returns the probed media info with the encoder of every output stream ("copy" when
+    remuxed, None when there is no mp4) and the time it took.
+    """
+    start_time = time.time()
+    media = probe_media(source_path)
+    command = transcode_command(source_path, mp3_path, mp4_path, media)
+
+    # stderr goes to a file, as the errors of a damaged recording can fill a pipe nobody reads until
+    # stdout ends, and block ffmpeg
+    with tempfile.TemporaryFile(mode="w+") as stderr:
+        process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr, text=True
+        )
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if progress is None or media["duration"] <= 0:
+                continue
+            if key == "out_time_us" and value.isdigit():
+                progress(min(1.0, int(value) / 1e6 / media["duration"]))
+            elif key == "progress" and value == "end":
+                progress(1.0)
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise Exception(f"ffmpeg failed to convert {source_path}: {stderr.read().strip()}")
+
+    video_output, audio_output = output_codecs(media) if mp4_path is not None else (None, None)
+    return {
+        **media,
+        "video_output": video_output,
+        "audio_output": audio_output,
+        "seconds": time.time() - start_time,
+    }
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from ai_utils.extract.frame_sampler import open_video, segment_sampled_frames
+from ai_utils.extract.frame_scoring import (
+    SCORING_BATCH_SIZE,
+    blur_frame,
+    fill_missing_magnitudes,
+    score_frames,
+)
+
+MIN_SEGMENT_SECONDS = 30
+
+
+def split_segments(total_seconds, workers, min_segment_seconds=MIN_SEGMENT_SECONDS):
+    """Split [0, total_seconds) into at most `workers` contiguous (start, end) second ranges."""
+    count = max(1, min(workers, total_seconds // max(1, min_segment_seconds)))
+    size = -(-total_seconds // count)
+    return [(start, min(start + size, total_seconds)) for start in range(0, total_seconds, size)]
+
+
+def score_segment(video_path, start_second, end_second, batch_size=SCORING_BATCH_SIZE):
+    """Score the sampled frames of one segment and return its (time_spans, list_diff_mag).
+
+    The sample just before the segment is decoded too, so the diff across the segment boundary is
+    the same as in a serial run. Missing magnitudes are left as None for the caller to fill.
+    """
+    cap, _, fps = open_video(video_path)
+    boundary = max(0, start_second - 1)
+
+    def blurred_frames():
+        for second, frame in segment_sampled_frames(cap, fps, boundary, end_second):
+            yield second, blur_frame(frame)
+
+    try:
+        time_spans, list_diff_mag = score_frames(blurred_frames(), batch_size=batch_size, fill_missing=False)
+    finally:
+        cap.release()
+
+    skip = start_second - boundary
+    return time_spans[skip:], list_diff_mag[skip:]
+
+
+def parallel_score_frames(video_path, length, fps, workers=None, batch_size=SCORING_BATCH_SIZE):
+    """Score the sampled frames of the whole video in segments across a process pool.
+
+    The segment series are stitched back together in order and missing magnitudes are filled
+    once on the full series, so the result matches score_frames over the sequential sampler.
+    """
+    workers = workers or os.cpu_count()
+    segments = split_segments(length // fps + 1, workers)
+
+    # spawn instead of fork: the parent may be an RQ worker holding TensorFlow/OpenCV threads
+    with ProcessPoolExecutor(max_workers=len(segments), mp_context=get_context("spawn")) as executor:
+        futures = [
+            executor.submit(score_segment, str(video_path), start, end, batch_size)
+            for start, end in segments
+        ]
+        time_spans = []
+        list_diff_mag = []
+        for future in futures:
+            segment_time_spans, segment_diff_mag = future.result()
+            time_spans.extend(segment_time_spans)
+            list_diff_mag.extend(segment_diff_mag)
+
+    return time_spans, fill_missing_magnitudes(list_diff_mag)
@@ -0,0 +1,123 @@
+import subprocess
+import time
+
+import ffmpeg
+
+CLIP_PADDING = 3
+CLIP_BATCH_SIZE = 32
+MAX_KEYFRAME_DRIFT = 1.0
+
+
+def clip_windows(seconds, duration, padding=CLIP_PADDING):
+    """Return the (start, end) window of `padding` seconds around every second, within the video."""
+    return [(max(0.0, float(second - padding)), min(float(duration), float(second + padding))) for second in seconds]
+
+
+def merge_windows(windows):
+    """Merge overlapping windows into clips.
+
+    Returns the merged (start, end) clips in time order and, for every input window, the index of
+    the clip that contains it.
+    """
+    order = sorted(range(len(windows)), key=lambda index: windows[index])
+    clips = []
+    owners = [0] * len(windows)
+    for index in order:
+        start, end = windows[index]
+        if len(clips) > 0 and start <= clips[-1][1]:
+            clips[-1] = (clips[-1][0], max(clips[-1][1], end))
+        else:
+            clips.append((start, end))
+        owners[index] = len(clips) - 1
+    return clips, owners
+
+
+def keyframe_times(video_path, starts):
+    """Return the time of the last video keyframe at or before every start, None when unknown.
+
+    ffprobe seeks to every start, which lands on the preceding keyframe, and reads one packet there,
+    so this does not scan the whole file.
+    """
+    if len(starts) == 0:
+        return []
+    probe = ffmpeg.probe(
+        str(video_path),
+        select_streams="v:0",
+        show_entries="packet=pts_time,flags",
+        read_intervals=",".join(f"{start}%+#1" for start in starts),
+    )
+    packets = probe.get("packets", [])
+    if len(packets) != len(starts):
+        return [None] * len(starts)
+    return [
+        float(packet["pts_time"]) if "K" in packet.get("flags", "") and "pts_time" in packet else None
+        for packet in packets
+    ]
+
+
+def __clip_arguments(video_path, start, end, keyframe, max_keyframe_drift):
+    """Return the ffmpeg input and output arguments of one clip and whether it is stream copied."""
+    if keyframe is not None and 0 <= start - keyframe <= max_keyframe_drift:
+        # Starting on the keyframe lets the clip be copied without decoding
+        input_arguments = ["-ss", str(keyframe), "-t", str(end - keyframe), "-i", str(video_path)]
+        codec_arguments = ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+        return input_arguments, codec_arguments, True
+    input_arguments = ["-ss", str(start), "-t", str(end - start), "-i", str(video_path)]
+    codec_arguments = ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac"]
+    return input_arguments, codec_arguments, False
+
+
+def iter_cut_clips(video_path, clips, output_paths, max_keyframe_drift=MAX_KEYFRAME_DRIFT, batch_size=CLIP_BATCH_SIZE):
+    """Cut the (start, end) clips of a video into the output paths, yielding the clips of every batch once cut.
+
+    Every clip of a batch is a separate seeking input of the same ffmpeg process, so the source is
+    only read around the clips. A clip whose start is at most max_keyframe_drift seconds after a
+    keyframe is stream copied from that keyframe; the others are re-encoded from their exact start.
+    The caller can publish the clips of a batch while the next batch is cut.
+    """
+    keyframes = keyframe_times(video_path, [start for start, _ in clips])
+    for batch_start in range(0, len(clips), batch_size):
+        start_time = time.time()
+        command = ["ffmpeg", "-y", "-v", "error"]
+        outputs = []
+        modes = []
+        for input_index, clip_index in enumerate(range(batch_start, min(batch_start + batch_size, len(clips)))):
+            start, end = clips[clip_index]
+            input_arguments, codec_arguments, copied = __clip_arguments(
+                video_path, start, end, keyframes[clip_index], max_keyframe_drift
+            )
+            command += input_arguments
+            outputs += [
+                "-map", f"{input_index}:v:0", "-map", f"{input_index}:a:0?",
+                *codec_arguments, "-movflags", "+faststart", str(output_paths[clip_index]),
+            ]
+            modes.append("copy" if copied else "encode")
+
+        process = subprocess.run(command + outputs, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise Exception(f"ffmpeg failed to cut clips of {video_path}: {process.stderr.strip()}")
+
+        elapsed = time.time() - start_time
+        batch = []
+        for offset, mode in enumerate(modes):
+            start, end = clips[batch_start + offset]
+            batch.append(
+                {
+                    "index": batch_start + offset,
+                    "path": str(output_paths[batch_start + offset]),
+                    "start": start,
+                    "end": end,
+                    "mode": mode,
+                    "batch_seconds": elapsed,
+                }
+            )
+        yield batch
+
+
+def cut_clips(video_path, clips, output_paths, max_keyframe_drift=MAX_KEYFRAME_DRIFT, batch_size=CLIP_BATCH_SIZE):
+    """Cut all clips with iter_cut_clips, returning how every clip was cut and the time its batch took."""
+    return [
+        clip
+        for batch in iter_cut_clips(video_path, clips, output_paths, max_keyframe_drift, batch_size)
+        for clip in batch
+    ]
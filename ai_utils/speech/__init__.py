@@ -0,0 +1,2 @@
+from .recognizer import *
+from .transcribe import *
@@ -0,0 +1,176 @@
+import json
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+GOOGLE_LANGUAGE_CODE = "id-ID"
+GOOGLE_ALTERNATIVE_LANGUAGE_CODES = ["en-ES", "en-US"]
+GOOGLE_CHUNK_TIMEOUT = 600
+VOSK_SAMPLE_RATE = 16000
+# Bytes of 16-bit PCM fed to the Vosk recognizer at a time
+VOSK_READ_SIZE = 8000
+RECOGNIZERS = ["google", "vosk"]
+
+
+@dataclass
+class AudioChunk:
+    """Piece of a recording, `start` and `duration` in seconds of the whole recording.
+
+    When `source` is set, the chunk is cut from that recording into `path` right before it is
+    transcribed, see extract_chunk.
+    """
+
+    index: int
+    path: str
+    start: float
+    duration: float
+    source: Optional[str] = None
+
+
+@dataclass
+class RecognizedWord:
+    """Transcribed word with its start and end time in seconds."""
+
+    word: str
+    start: float
+    end: float
+
+
+class Recognizer(object):
+    """Speech-to-text engine that transcribes one audio chunk at a time.
+
+    recognize() returns the words of the chunk with times relative to the start of the chunk.
+    Implementations must be safe to call from several threads at once.
+    """
+
+    def load(self):
+        """Load what the recognizer needs up front, e.g. when a worker starts."""
+        pass
+
+    def recognize(self, chunk: AudioChunk) -> List[RecognizedWord]:
+        raise NotImplementedError()
+
+
+class StubRecognizer(Recognizer):
+    """Recognizer returning a known transcript of the whole recording, for tests and benchmarks.
+
+    Every chunk gets the words that fall inside it, after sleeping `latency` seconds per second of
+    audio to stand in for a real engine. Words cut by the edge of a chunk are dropped, as a real
+    engine would miss or garble them.
+    """
+
+    def __init__(self, words: Sequence[RecognizedWord], latency: float = 0.0):
+        self.words = list(words)
+        self.latency = latency
+
+    def recognize(self, chunk: AudioChunk) -> List[RecognizedWord]:
+        time.sleep(self.latency * chunk.duration)
+        end = chunk.start + chunk.duration
+        return [
+            RecognizedWord(word.word, word.start - chunk.start, word.end - chunk.start)
+            for word in self.words
+            if word.start >= chunk.start and word.end <= end
+        ]
+
+
+class GoogleRecognizer(Recognizer):
+    """Google Cloud Speech-to-Text, sending every chunk as the content of its own long running operation."""
+
+    def __init__(self, client=None, timeout: float = GOOGLE_CHUNK_TIMEOUT):
+        self.client = client
+        self.timeout = timeout
+
+    def recognize(self, chunk: AudioChunk) -> List[RecognizedWord]:
+        from google.cloud import speech_v1p1beta1 as speech
+
+        if self.client is None:
+            self.client = speech.SpeechClient()
+
+        with open(chunk.path, "rb") as file:
+            audio = speech.RecognitionAudio(content=file.read())
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.FLAC,
+            sample_rate_hertz=16000,
+            enable_word_time_offsets=True,
+            language_code=GOOGLE_LANGUAGE_CODE,
+            alternative_language_codes=GOOGLE_ALTERNATIVE_LANGUAGE_CODES,
+        )
+        response = self.client.long_running_recognize(config=config, audio=audio).result(timeout=self.timeout)
+
+        return [
+            RecognizedWord(word.word, word.start_time.total_seconds(), word.end_time.total_seconds())
+            for result in response.results
+            if len(result.alternatives) > 0
+            for word in result.alternatives[0].words
+        ]
+
+
+class VoskRecognizer(Recognizer):
+    """Offline recognizer running a Vosk (Kaldi) model on the CPU of the worker.
+
+    vosk is an optional dependency, imported when the model is loaded. The model is loaded once
+    and shared by every thread and every later job of the process; each recognize call decodes
+    its chunk to 16 kHz PCM with ffmpeg and feeds it to its own KaldiRecognizer.
+    """
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.model = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.model is None:
+                from vosk import Model, SetLogLevel
+
+                SetLogLevel(-1)
+                start_time = time.time()
+                self.model = Model(self.model_path)
+                print(f"Vosk model {self.model_path} loaded in {time.time() - start_time:.2f} s")
+        return self.model
+
+    def recognize(self, chunk: AudioChunk) -> List[RecognizedWord]:
+        from vosk import KaldiRecognizer
+
+        recognizer = KaldiRecognizer(self.load(), VOSK_SAMPLE_RATE)
+        recognizer.SetWords(True)
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-v", "error", "-i", chunk.path,
+                "-ac", "1", "-ar", str(VOSK_SAMPLE_RATE), "-f", "s16le", "-",
+            ],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        results = []
+        for data in iter(lambda: process.stdout.read(VOSK_READ_SIZE), b""):
+            if recognizer.AcceptWaveform(data):
+                results.append(recognizer.Result())
+        results.append(recognizer.FinalResult())
+        error = process.stderr.read()
+        if process.wait() != 0:
+            raise Exception(f"ffmpeg failed to decode {chunk.path}: {error.decode().strip()}")
+
+        return [
+            RecognizedWord(word["word"], float(word["start"]), float(word["end"]))
+            for result in results
+            for word in json.loads(result).get("result", [])
+        ]
+
+
+# Recognizers are shared process-wide, so a loaded model is reused by every job of a worker
+__RECOGNIZERS: Dict[Tuple[str, Optional[str]], Recognizer] = {}
+__RECOGNIZERS_LOCK = threading.Lock()
+
+
+def get_recognizer(name: str, model_path: Optional[str] = None) -> Recognizer:
+    """Return the process-wide recognizer of the given backend, "google" or "vosk" (which needs model_path)."""
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer '{name}', expected one of {RECOGNIZERS}")
+    with __RECOGNIZERS_LOCK:
+        recognizer = __RECOGNIZERS.get((name, model_path))
+        if recognizer is None:
+            recognizer = GoogleRecognizer() if name == "google" else VoskRecognizer(model_path)
+            __RECOGNIZERS[(name, model_path)] = recognizer
+        return recognizer
@@ -0,0 +1,119 @@
+import math
+import os
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Tuple
+
+import ffmpeg
+
+from ai_utils.speech.recognizer import AudioChunk, RecognizedWord, Recognizer
+from ai_utils.text.normalize import normalize_word
+
+CHUNK_SECONDS = 300.0
+CHUNK_OVERLAP_SECONDS = 5.0
+CHUNK_WORKERS = 4
+# Words recognized in both chunks of an overlap may get slightly different times
+DUPLICATE_TOLERANCE = 0.5
+
+
+def plan_chunks(duration: float, chunk_seconds: float = CHUNK_SECONDS, overlap: float = CHUNK_OVERLAP_SECONDS) -> List[Tuple[float, float]]:
+    """Return the (start, duration) of chunks covering the recording, each overlapping the next by `overlap` seconds."""
+    if duration <= chunk_seconds:
+        return [(0.0, float(duration))]
+    step = chunk_seconds - overlap
+    count = math.ceil((duration - overlap) / step)
+    return [(index * step, min(chunk_seconds, duration - index * step)) for index in range(count)]
+
+
+def split_audio(audio_path: str, workdir: str, chunk_seconds: float = CHUNK_SECONDS, overlap: float = CHUNK_OVERLAP_SECONDS) -> List[AudioChunk]:
+    """Plan the overlapping chunks of a recording, to be cut into workdir by the worker that transcribes each one."""
+    duration = float(ffmpeg.probe(str(audio_path))["format"]["duration"])
+    return [
+        AudioChunk(index=index, path=os.path.join(workdir, f"chunk_{index}.flac"), start=start, duration=length, source=str(audio_path))
+        for index, (start, length) in enumerate(plan_chunks(duration, chunk_seconds, overlap))
+    ]
+
+
+def extract_chunk(chunk: AudioChunk):
+    """Cut the chunk from its source recording as 16 kHz mono FLAC, seeking to it instead of decoding what comes before."""
+    command = [
+        "ffmpeg", "-y", "-v", "error", "-ss", str(chunk.start), "-t", str(chunk.duration), "-i", chunk.source,
+        "-map", "0:a:0", "-ac", "1", "-ar", "16000", "-c:a", "flac", chunk.path,
+    ]
+    process = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed to cut chunk {chunk.index} of {chunk.source}: {process.stderr.strip()}")
+
+
+def recognize_chunk(recognizer: Recognizer, chunk: AudioChunk) -> List[RecognizedWord]:
+    """Cut the chunk if it has a source and transcribe it, deleting the cut file afterwards."""
+    if chunk.source is None:
+        return recognizer.recognize(chunk)
+    extract_chunk(chunk)
+    try:
+        return recognizer.recognize(chunk)
+    finally:
+        os.remove(chunk.path)
+
+
+def owned_span(chunks: List[AudioChunk], index: int) -> Tuple[float, float]:
+    """Return the part of the recording whose words are taken from the chunk: up to the middle of each overlap."""
+    chunk = chunks[index]
+    start = chunk.start if index == 0 else (chunk.start + chunks[index - 1].start + chunks[index - 1].duration) / 2
+    if index == len(chunks) - 1:
+        end = math.inf
+    else:
+        end = (chunks[index + 1].start + chunk.start + chunk.duration) / 2
+    return start, end
+
+
+def transcribe_chunks(chunks: List[AudioChunk], recognizer: Recognizer, workers: int = CHUNK_WORKERS) -> Iterator[List[RecognizedWord]]:
+    """Cut and transcribe the chunks concurrently and yield the words of every chunk in recording order.
+
+    Word times are offset to the whole recording. Every chunk only keeps the words starting in its
+    owned span, and a word repeated within DUPLICATE_TOLERANCE seconds across a boundary is only
+    kept once. A chunk is yielded as soon as it and every chunk before it are transcribed, so
+    the transcript arrives in order while the later chunks are still running.
+    """
+    results: Dict[int, List[RecognizedWord]] = {}
+    previous: List[RecognizedWord] = []
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(recognize_chunk, recognizer, chunk): chunk.index for chunk in chunks}
+        pending = set(futures)
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+
+            while next_index in results:
+                chunk = chunks[next_index]
+                span_start, span_end = owned_span(chunks, next_index)
+                words = []
+                for word in results.pop(next_index):
+                    word = RecognizedWord(word.word, word.start + chunk.start, word.end + chunk.start)
+                    if not span_start <= word.start < span_end:
+                        continue
+                    if any(
+                        normalize_word(kept.word) == normalize_word(word.word) and abs(kept.start - word.start) <= DUPLICATE_TOLERANCE
+                        for kept in previous[-8:]
+                    ):
+                        continue
+                    words.append(word)
+                previous = words or previous
+                next_index += 1
+                yield words
+
+
+def iter_audio_violations(chunks: List[AudioChunk], recognizer: Recognizer, lexicon, workers: int = CHUNK_WORKERS) -> Iterator[Dict]:
+    """Yield a {"word", "time"} violation for every lexicon hit as soon as the chunks before it are transcribed.
+
+    The words are streamed into one scanner of the lexicon, so phrases spanning two chunks are
+    found too. The time of a hit is the start of its first word.
+    """
+    scanner = lexicon.scanner()
+    transcript: List[RecognizedWord] = []
+    for words in transcribe_chunks(chunks, recognizer, workers):
+        transcript += words
+        for start, end, _ in scanner.feed([word.word for word in words]):
+            yield {"word": " ".join(word.word for word in transcript[start:end]), "time": transcript[start].start}
@@ -0,0 +1,2 @@
+from .frame_store import *
+from .transfer import *
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class FrameStore(object):
+    """Decoded frames shared between the workers of one host, keyed by moderation id.
+
+    Every frame is saved as a raw .npy array under `<root>/<key>/` with an atomic rename, and read
+    back memory-mapped, so detection gets the exact pixels extraction decoded without a JPEG
+    round-trip through the bucket. The frames of a key are deleted once every consumer has
+    released them, or once they are older than max_age_seconds when a consumer never ran.
+    """
+
+    def __init__(self, root: str, max_age_seconds: float, consumers: Iterable[str] = ("detection", "upload")):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self.consumers = list(consumers)
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, key: str, name: str, frame: np.ndarray):
+        """Save a frame of the key under its name, e.g. the blob path of its JPEG."""
+        directory = os.path.join(self.root, key)
+        os.makedirs(directory, exist_ok=True)
+        path = self.__frame_path(key, name)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.save(file, np.ascontiguousarray(frame))
+        os.replace(temp_path, path)
+
+    def get(self, key: str, name: str) -> Optional[np.ndarray]:
+        """Return the frame memory-mapped read-only, or None when it is not in the store."""
+        try:
+            return np.load(self.__frame_path(key, name), mmap_mode="r")
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key: str, name: str) -> bool:
+        return os.path.exists(self.__frame_path(key, name))
+
+    def release(self, key: str, consumer: str):
+        """Mark the frames of the key as no longer needed by the consumer, deleting them after the last one."""
+        directory = os.path.join(self.root, key)
+        if not os.path.isdir(directory):
+            return
+        open(os.path.join(directory, f"{consumer}.released"), "w").close()
+        if all(os.path.exists(os.path.join(directory, f"{name}.released")) for name in self.consumers):
+            shutil.rmtree(directory, ignore_errors=True)
+        self.cleanup_stale()
+
+    def cleanup_stale(self):
+        """Delete the frames of keys older than max_age_seconds."""
+        now = time.time()
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_dir() and now - entry.stat().st_mtime > self.max_age_seconds:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+    def get_usage(self) -> Dict[str, int]:
+        """Return the number of keys and frames in the store and the disk space they take."""
+        keys, frames, size = 0, 0, 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            keys += 1
+            for frame in os.scandir(entry.path):
+                if frame.name.endswith(".npy"):
+                    frames += 1
+                    size += frame.stat().st_size
+        return {"keys": keys, "frames": frames, "size_bytes": size}
+
+    def __frame_path(self, key: str, name: str) -> str:
+        return os.path.join(self.root, key, f"{hashlib.sha1(name.encode()).hexdigest()}.npy")
@@ -0,0 +1,204 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_WORKERS = 16
+TRANSFER_RETRIES = 3
+TRANSFER_BACKOFF_SECONDS = 1.0
+# Files above this size are transferred in chunks, each request of which the storage client retries on its own
+CHUNK_SIZE = 8 * 1024 * 1024
+# Maximum number of calls the storage JSON API accepts in one batch request
+DELETE_BATCH_SIZE = 100
+
+
+class StorageBackend(object):
+    """Storage the transfer manager moves files to and from, addressed by blob names."""
+
+    def upload(self, remote_dest: str, local_source: str, public: bool = False):
+        raise NotImplementedError()
+
+    def download(self, remote_source: str, local_dest: str):
+        raise NotImplementedError()
+
+    def delete(self, remote_names: List[str]):
+        """Delete the blobs, ignoring the ones that do not exist."""
+        raise NotImplementedError()
+
+
+class GCSBackend(StorageBackend):
+    """Google Cloud Storage bucket.
+
+    Files larger than chunk_size are uploaded with a resumable upload sent in chunks, and
+    downloaded in chunks. Both pass the client's DEFAULT_RETRY policy, which uploads do not use
+    unless told to, so a failing chunk request is retried by the client and only repeats its chunk
+    instead of the whole video. Deletes are sent in batch requests of DELETE_BATCH_SIZE blobs.
+    """
+
+    def __init__(self, client, bucket_name: str, chunk_size: int = CHUNK_SIZE):
+        self.client = client
+        self.bucket = client.bucket(bucket_name)
+        self.chunk_size = chunk_size
+
+    def upload(self, remote_dest: str, local_source: str, public: bool = False):
+        from google.cloud.storage.retry import DEFAULT_RETRY
+
+        if os.path.getsize(local_source) > self.chunk_size:
+            blob = self.bucket.blob(remote_dest, chunk_size=self.chunk_size)
+        else:
+            blob = self.bucket.blob(remote_dest)
+        blob.upload_from_filename(local_source, retry=DEFAULT_RETRY)
+        if public:
+            blob.make_public()
+
+    def download(self, remote_source: str, local_dest: str):
+        from google.cloud.storage.retry import DEFAULT_RETRY
+
+        # Small blobs still arrive in a single ranged request
+        blob = self.bucket.blob(remote_source, chunk_size=self.chunk_size)
+        blob.download_to_filename(local_dest, retry=DEFAULT_RETRY)
+
+    def delete(self, remote_names: List[str]):
+        from google.api_core.exceptions import NotFound
+
+        for start in range(0, len(remote_names), DELETE_BATCH_SIZE):
+            try:
+                with self.client.batch():
+                    for name in remote_names[start:start + DELETE_BATCH_SIZE]:
+                        self.bucket.blob(name).delete()
+            except NotFound:
+                # The batch is sent as a whole, the other blobs of it are deleted
+                continue
+
+
+class LocalBackend(StorageBackend):
+    """Directory on the local filesystem, used to run and benchmark the pipeline offline."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def upload(self, remote_dest: str, local_source: str, public: bool = False):
+        path = self.path(remote_dest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(local_source, temp_path)
+        os.replace(temp_path, path)
+
+    def download(self, remote_source: str, local_dest: str):
+        shutil.copyfile(self.path(remote_source), local_dest)
+
+    def delete(self, remote_names: List[str]):
+        for name in remote_names:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                continue
+
+
+class TransferManager(object):
+    """Moves files between the local disk and a storage backend on a bounded pool of threads.
+
+    Every transfer is retried with exponential backoff, and the batch methods run up to `workers`
+    transfers at the same time, so transferring hundreds of small files is not bound by the
+    latency of each request. Batch methods return one result per file instead of raising, with
+    the error of the files whose every attempt failed.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        workers: int = TRANSFER_WORKERS,
+        retries: int = TRANSFER_RETRIES,
+        backoff: float = TRANSFER_BACKOFF_SECONDS,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+
+    def upload(self, remote_dest: str, local_source: str, public: bool = False) -> int:
+        """Upload a file, returning the number of attempts it took or raising the last error."""
+        return self.__retry(f"Upload of {remote_dest}", self.backend.upload, remote_dest, local_source, public)
+
+    def download(self, remote_source: str, local_dest: str) -> int:
+        """Download a blob, returning the number of attempts it took or raising the last error.
+
+        The blob is written to a temporary file first, so local_dest never holds a partial file.
+        """
+        temp_path = f"{local_dest}.{threading.get_ident()}.part"
+        try:
+            attempts = self.__retry(f"Download of {remote_source}", self.backend.download, remote_source, temp_path)
+            os.replace(temp_path, local_dest)
+            return attempts
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def upload_many(self, files: Iterable[Tuple[str, str]], public: bool = False) -> List[Dict]:
+        """Upload the (remote_dest, local_source) files concurrently, returning their results in order."""
+        return self.__run_many(
+            [(remote_dest, self.upload, (remote_dest, local_source, public)) for remote_dest, local_source in files]
+        )
+
+    def download_many(self, local_dest: str, remote_sources: Iterable[str], skip_existing: bool = True) -> List[Dict]:
+        """Download the blobs concurrently into a directory under their base names, returning their results in order."""
+        transfers = []
+        for remote_source in remote_sources:
+            path = os.path.join(local_dest, remote_source.split("/")[-1])
+            if skip_existing and os.path.exists(path):
+                continue
+            transfers.append((remote_source, self.download, (remote_source, path)))
+        return self.__run_many(transfers)
+
+    def delete_many(self, remote_names: Iterable[str]):
+        """Delete the blobs in as few requests as the backend allows."""
+        remote_names = list(remote_names)
+        self.__retry(f"Delete of {len(remote_names)} blobs", self.backend.delete, remote_names)
+
+    def __run_many(self, transfers: List[Tuple]) -> List[Dict]:
+        def run(transfer: Tuple) -> Dict:
+            name, function, arguments = transfer
+            start_time = time.time()
+            try:
+                attempts = function(*arguments)
+                error = None
+            except Exception as err:
+                attempts = None
+                error = str(err)
+                logger.error(f"{name}: {error}")
+            return {"name": name, "attempts": attempts, "seconds": time.time() - start_time, "error": error}
+
+        if len(transfers) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(transfers))) as executor:
+            return list(executor.map(run, transfers))
+
+    def __retry(self, name: str, function, *arguments) -> int:
+        for attempt in range(1, self.retries + 1):
+            try:
+                function(*arguments)
+                return attempt
+            except Exception as err:
+                # A missing file or blob will not appear by retrying
+                if attempt == self.retries or isinstance(err, FileNotFoundError) or getattr(err, "code", None) == 404:
+                    raise err
+                logger.warning(f"{name} failed (attempt {attempt}/{self.retries}): {err}")
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+
+def create_backend(name: str, client=None, bucket_name: Optional[str] = None, local_path: Optional[str] = None) -> StorageBackend:
+    """Return the storage backend configured by name, "gcs" or "local"."""
+    if name == "local":
+        return LocalBackend(local_path)
+    if name == "gcs":
+        return GCSBackend(client, bucket_name)
+    raise ValueError(f"Unknown storage backend {name}")
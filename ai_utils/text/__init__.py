@@ -0,0 +1,3 @@
+from .lexicon import *
+from .normalize import *
+from .phrase_matcher import *
@@ -0,0 +1,126 @@
+import csv
+import io
+import logging
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from ai_utils.text.normalize import normalize_phrase
+from ai_utils.text.phrase_matcher import PhraseMatcher, PhraseScanner
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the source version, the lexicon is only downloaded again when it changed
+LEXICON_CHECK_INTERVAL = 60.0
+LEXICON_COLUMN = "ABUSIVE"
+
+
+def parse_lexicon(text: str, column: str = LEXICON_COLUMN) -> frozenset:
+    """Return the normalized words and phrases of a one-entry-per-row CSV, skipping its header row."""
+    entries = set()
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) == 0 or row[0].strip().upper() == column:
+            continue
+        entry = normalize_phrase(row[0])
+        if entry != "":
+            entries.add(entry)
+    return frozenset(entries)
+
+
+class GCSLexiconSource(object):
+    """Lexicon CSV stored as a blob, versioned by the blob generation."""
+
+    def __init__(self, bucket_name: str, blob_name: str, client=None):
+        self.bucket_name = bucket_name
+        self.blob_name = blob_name
+        self.client = client
+
+    def __bucket(self):
+        if self.client is None:
+            from google.cloud import storage
+
+            self.client = storage.Client()
+        return self.client.bucket(self.bucket_name)
+
+    def version(self) -> Optional[str]:
+        blob = self.__bucket().get_blob(self.blob_name)
+        return None if blob is None else str(blob.generation)
+
+    def read(self) -> Tuple[str, str]:
+        blob = self.__bucket().get_blob(self.blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"Lexicon gs://{self.bucket_name}/{self.blob_name} does not exist.")
+        # Download the generation that was looked up, so the version and the content always match
+        text = blob.download_as_bytes(if_generation_match=blob.generation).decode("utf-8")
+        return str(blob.generation), text
+
+
+class FileLexiconSource(object):
+    """Lexicon CSV on the local disk, versioned by its modification time and size."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def version(self) -> Optional[str]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def read(self) -> Tuple[str, str]:
+        version = self.version()
+        with open(self.path, encoding="utf-8") as file:
+            return version, file.read()
+
+
+class Lexicon(object):
+    """Set of normalized words and phrases loaded once from a source and refreshed only when the source changes.
+
+    The source version (the blob generation for GCS) is checked at most every check_interval
+    seconds, and the CSV is only downloaded and parsed again, and its phrase matcher rebuilt, when
+    the version differs from the loaded one. When a refresh fails, the loaded entries are kept.
+    """
+
+    def __init__(self, source, check_interval: float = LEXICON_CHECK_INTERVAL):
+        self.source = source
+        self.check_interval = check_interval
+        self.entries = frozenset()
+        self.matcher = PhraseMatcher([])
+        self.loaded_version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def words(self) -> frozenset:
+        """Return the current words, refreshing them first when the check interval has passed."""
+        if self.checked_at is None or time.time() - self.checked_at >= self.check_interval:
+            self.refresh()
+        return self.entries
+
+    def refresh(self, force: bool = False):
+        with self.lock:
+            self.checked_at = time.time()
+            try:
+                if not force and self.loaded_version is not None and self.source.version() == self.loaded_version:
+                    return
+                version, text = self.source.read()
+                entries = parse_lexicon(text)
+                self.matcher = PhraseMatcher(entries)
+                self.entries = entries
+                self.loaded_version = version
+                logger.info(f"Loaded {len(self.entries)} lexicon entries (version {version}).")
+            except Exception as err:
+                if self.loaded_version is None:
+                    raise err
+                logger.error(f"Keeping lexicon version {self.loaded_version}: {err}")
+
+    def match(self, words: Iterable[str]) -> List[Tuple[int, int, str]]:
+        """Return the (start, end, entry) of every lexicon word or phrase in the sequence of words, see PhraseMatcher.find."""
+        self.words()
+        return self.matcher.find(list(words))
+
+    def scanner(self) -> PhraseScanner:
+        """Return a scanner matching the current entries against a transcript that arrives in pieces."""
+        self.words()
+        return self.matcher.scanner()
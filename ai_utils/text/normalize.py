@@ -0,0 +1,15 @@
+import re
+
+# Anything that is not a letter or a digit at either end of a word, e.g. punctuation, quotes or dashes
+SURROUNDING_SYMBOLS = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_word(word: str) -> str:
+    """Return the form words are compared in: case-folded, without surrounding punctuation."""
+    return SURROUNDING_SYMBOLS.sub("", str(word).casefold())
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Return the normalized words of a phrase joined by single spaces."""
+    words = [normalize_word(word) for word in str(phrase).split()]
+    return " ".join(word for word in words if word != "")
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from ai_utils.text.normalize import normalize_phrase, normalize_word
+
+
+class PhraseMatcher(object):
+    """Aho–Corasick automaton whose alphabet is normalized words instead of characters.
+
+    Every lexicon phrase is a path of words from the root. Failure links point to the longest
+    proper suffix of the matched words that is also a phrase prefix, and every state keeps the
+    lengths of the phrases ending in it. find() walks the transcript once, so it takes time linear
+    in the number of words plus the number of hits, whatever the size of the lexicon.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.failures: List[int] = [0]
+        self.outputs: List[List[Tuple[int, str]]] = [[]]
+        self.max_length = 0
+        for phrase in phrases:
+            self.__add(normalize_phrase(phrase))
+        self.__link()
+
+    def __add(self, phrase: str):
+        words = phrase.split()
+        if len(words) == 0:
+            return
+        state = 0
+        for word in words:
+            next_state = self.transitions[state].get(word)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.failures.append(0)
+                self.outputs.append([])
+                self.transitions[state][word] = next_state
+            state = next_state
+        self.max_length = max(self.max_length, len(words))
+        if (len(words), phrase) not in self.outputs[state]:
+            self.outputs[state].append((len(words), phrase))
+
+    def __link(self):
+        queue = deque(self.transitions[0].values())
+        while len(queue) > 0:
+            state = queue.popleft()
+            for word, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure != 0 and word not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                self.failures[next_state] = self.transitions[failure].get(word, 0)
+                # Phrases ending in the failure state also end here
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failures[next_state]]
+
+    def find(self, words: Sequence[str]) -> List[Tuple[int, int, str]]:
+        """Return the (start, end, phrase) of every phrase hit, start and end being indexes into words.
+
+        Words that normalize to nothing (e.g. lone punctuation) are skipped, so a phrase still
+        matches across them. Hits are ordered by their last word, then longest first.
+        """
+        return self.scanner().feed(words)
+
+    def scanner(self) -> "PhraseScanner":
+        """Return a scanner to find the phrases of a transcript that arrives in pieces."""
+        return PhraseScanner(self)
+
+
+class PhraseScanner(object):
+    """Incremental PhraseMatcher.find over a stream of words.
+
+    Every call to feed() continues where the previous one stopped, so a phrase split across two
+    pieces is still found, and hit indexes count from the first word ever fed. Only the positions
+    of the last max_length words are kept.
+    """
+
+    def __init__(self, matcher: PhraseMatcher):
+        self.matcher = matcher
+        self.state = 0
+        self.positions = deque(maxlen=max(matcher.max_length, 1))
+        self.count = 0
+
+    def feed(self, words: Iterable[str]) -> List[Tuple[int, int, str]]:
+        transitions, failures, outputs = self.matcher.transitions, self.matcher.failures, self.matcher.outputs
+        hits = []
+        for word in words:
+            index = self.count
+            self.count += 1
+            word = normalize_word(word)
+            if word == "":
+                continue
+            self.positions.append(index)
+            while self.state != 0 and word not in transitions[self.state]:
+                self.state = failures[self.state]
+            self.state = transitions[self.state].get(word, 0)
+            for length, phrase in outputs[self.state]:
+                hits.append((self.positions[-length], index + 1, phrase))
+        return hits
@@ -1,46 +1,62 @@
 import logging
-import os
-from typing import List
-
-from app.api.exceptions import ApplicationException
-from config import GOOGLE_BUCKET_NAME, GOOGLE_STORAGE_CLIENT
+from typing import List, Optional
+
+from ai_utils.storage import TransferManager, create_backend
+from app.api.common.media_cache import MediaCache
+from config import (
+    GOOGLE_BUCKET_NAME,
+    GOOGLE_STORAGE_CLIENT,
+    MEDIA_CACHE_MAX_BYTES,
+    MEDIA_CACHE_PATH,
+    STORAGE_BACKEND,
+    STORAGE_LOCAL_PATH,
+    STORAGE_TRANSFER_WORKERS,
+)
+from redis_worker import conn
 
 logger = logging.getLogger(__name__)
 
+# Media files shared by the pipeline stages running on this host, keyed by their GCS blob path
+MEDIA_CACHE = MediaCache(MEDIA_CACHE_PATH, MEDIA_CACHE_MAX_BYTES, conn)
+
+# Concurrent, retried transfers to the configured storage, google cloud storage unless running offline
+TRANSFER_MANAGER = TransferManager(
+    create_backend(STORAGE_BACKEND, GOOGLE_STORAGE_CLIENT, GOOGLE_BUCKET_NAME, STORAGE_LOCAL_PATH),
+    workers=STORAGE_TRANSFER_WORKERS,
+)
+
 # main method to upload to gcs
 def upload_to_gcloud(remote_dest: str, local_source: str):
     try:
-        bucket = GOOGLE_STORAGE_CLIENT.bucket(GOOGLE_BUCKET_NAME)
-        file_blob = bucket.blob(remote_dest)
-        file_blob.upload_from_filename(local_source)
-        file_blob.make_public()
+        TRANSFER_MANAGER.upload(remote_dest, local_source, public=True)
     except Exception as err:
         logger.error(str(err))
 
-# main method to downloads from gcs
+# upload to gcs and make the blob public, retrying with exponential backoff and raising when every attempt failed
+def upload_to_gcloud_with_retry(remote_dest: str, local_source: str) -> int:
+    return TRANSFER_MANAGER.upload(remote_dest, local_source, public=True)
+
+# main method to downloads from gcs, the files are downloaded concurrently
 def download_files_gcloud(local_dest: str, source: List[str]):
+    results = TRANSFER_MANAGER.download_many(local_dest, source)
+    failed = [result["name"] for result in results if result["error"] is not None]
+    if len(failed) > 0:
+        logger.error(f"Failed to download {len(failed)} of {len(results)} files: {failed}")
+
+# main method to get a file from the local media cache, downloading it from gcs on a miss
+# when a workdir is given the file is linked into it, so it stays readable when the cache evicts it
+def fetch_file_gcloud(remote_source: str, workdir: Optional[str] = None) -> str:
+    return MEDIA_CACHE.fetch(
+        remote_source, lambda local_dest: TRANSFER_MANAGER.download(remote_source, local_dest), workdir
+    )
+
+# delete blobs from gcs, batched into as few requests as possible
+def delete_files_gcloud(remote_blob_names: List[str]):
     try:
-        bucket = GOOGLE_STORAGE_CLIENT.bucket(GOOGLE_BUCKET_NAME)
-        for file in source:
-            if os.path.exists(f"{local_dest}/{file.split('/')[-1]}"):
-                continue
-            file_blob = bucket.blob(file)
-            filename = file.split("/")[-1]
-            file_blob.download_to_filename(f"{local_dest}/{filename}")
+        TRANSFER_MANAGER.delete_many(remote_blob_names)
+        logger.info(f"Deleted {len(remote_blob_names)} blobs.")
     except Exception as err:
         logger.error(str(err))
 
 def delete_file_gcloud(remote_blob_name):
-    try:
-        bucket = GOOGLE_STORAGE_CLIENT.bucket(GOOGLE_BUCKET_NAME)
-        blob = bucket.blob(remote_blob_name)
-        generation_match_precondition = None
-
-        blob.reload()  # Fetch blob metadata to use in generation_match_precondition.
-        generation_match_precondition = blob.generation
-
-        blob.delete(if_generation_match=generation_match_precondition)
-
-        print(f"Blob {remote_blob_name} deleted.")
-    except Exception as err:
-            logger.error(str(err))
+    delete_files_gcloud([remote_blob_name])
@@ -0,0 +1,236 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from typing import Callable, Dict, Optional, Set
+
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class MediaCache(object):
+    """Content-addressed cache of media files shared by the workers of one host.
+
+    Files are stored once per content under `objects/<sha256><suffix>`, and every key (e.g. the
+    GCS blob path of an upload) points to its content through a small file under `refs/`. Both are
+    written with atomic renames, so worker processes can share the directory without locks. When
+    the cache grows past max_bytes, the least recently used objects are evicted, except the pinned
+    ones (e.g. media that is not in GCS yet), which stay until every key pinning them is unpinned.
+    A job reading a file for a while fetches it as a hard link into its own directory, which keeps
+    the file readable when the cache evicts the object. Hits and misses are counted in Redis when a
+    connection is given, so the counters cover every worker.
+    """
+
+    def __init__(self, root: str, max_bytes: int, connection: Optional[Redis] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.connection = connection
+        self.counters = {"hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "refs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "pins"), exist_ok=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached path of the key and mark it as recently used, or None on a miss."""
+        object_path = self.__object_path(key)
+        if object_path is None or not os.path.exists(object_path):
+            self.__count("misses")
+            return None
+        try:
+            os.utime(object_path)
+        except FileNotFoundError:
+            # Evicted by another worker in the meantime
+            self.__count("misses")
+            return None
+        self.__count("hits")
+        return object_path
+
+    def put(self, key: str, path: str, move: bool = True, pinned: bool = False) -> str:
+        """Add a file to the cache under the key and return its cached path.
+
+        The file is moved into the cache (or copied when move is False), and the cache is trimmed
+        to max_bytes afterwards, never evicting the file that was just added. A pinned file is
+        never evicted until unpin() is called for its key, and for every other key that pinned it.
+        """
+        digest = self.__file_digest(path)
+        object_name = f"{digest}{os.path.splitext(key)[1]}"
+        object_path = os.path.join(self.root, "objects", object_name)
+
+        if os.path.exists(object_path):
+            os.utime(object_path)
+            if move:
+                os.remove(path)
+        else:
+            temp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            if move:
+                shutil.move(path, temp_path)
+            else:
+                shutil.copyfile(path, temp_path)
+            os.replace(temp_path, object_path)
+
+        if pinned:
+            self.__write_file(self.__pin_path(key), object_name)
+        self.__write_ref(key, object_name)
+        self.evict(keep=object_path)
+        return object_path
+
+    def fetch(self, key: str, download: Callable[[str], None], link_dir: Optional[str] = None) -> str:
+        """Return the cached path of the key, calling download(path) and caching the file on a miss.
+
+        With link_dir, the file is returned as a hard link in that directory (a copy when it is on
+        another filesystem) named after the key. The link stays valid when the object is evicted,
+        until the caller deletes it, e.g. with the workspace of its job.
+        """
+        object_path = self.get(key)
+        if object_path is not None:
+            if link_dir is None:
+                return object_path
+            try:
+                return self.__link(object_path, os.path.join(link_dir, os.path.basename(key)))
+            except FileNotFoundError:
+                # Evicted by another worker in the meantime
+                pass
+
+        temp_path = os.path.join(self.root, f"download.{os.getpid()}.{threading.get_ident()}{os.path.splitext(key)[1]}")
+        try:
+            download(temp_path)
+            # Link the download before it enters the cache, where another worker may evict it at once
+            link_path = None
+            if link_dir is not None:
+                link_path = self.__link(temp_path, os.path.join(link_dir, os.path.basename(key)))
+            object_path = self.put(key, temp_path)
+            return link_path or object_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def unpin(self, key: str):
+        """Let the file of the key be evicted again, once no other key pins it."""
+        try:
+            os.remove(self.__pin_path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete the least recently used objects that are not pinned until the cache fits in max_bytes."""
+        objects_dir = os.path.join(self.root, "objects")
+        entries = []
+        for entry in os.scandir(objects_dir):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # Pinned objects count towards the size of the cache, but are never deleted
+        total = sum(size for _, size, _ in entries)
+        pinned = None
+        for _, size, object_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if pinned is None:
+                pinned = self.__pinned_objects()
+            if object_path == keep or os.path.basename(object_path) in pinned:
+                continue
+            try:
+                os.remove(object_path)
+                total -= size
+                logger.info(f"Evicted {object_path} ({size} bytes) from the media cache.")
+            except FileNotFoundError:
+                continue
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters and the current size of the cache."""
+        if self.connection is not None:
+            hits, misses = self.connection.mget(["media_cache:hits", "media_cache:misses"])
+            counters = {"hits": int(hits or 0), "misses": int(misses or 0)}
+        else:
+            counters = self.counters.copy()
+
+        entries = [
+            entry.stat().st_size
+            for entry in os.scandir(os.path.join(self.root, "objects"))
+            if not entry.name.endswith(".tmp")
+        ]
+        return {
+            **counters,
+            "entries": len(entries),
+            "size_bytes": sum(entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def __count(self, counter: str):
+        if self.connection is not None:
+            try:
+                self.connection.incr(f"media_cache:{counter}")
+                return
+            except Exception as err:
+                logger.error(str(err))
+        with self.lock:
+            self.counters[counter] += 1
+
+    def __ref_path(self, key: str) -> str:
+        return os.path.join(self.root, "refs", hashlib.sha1(key.encode()).hexdigest())
+
+    def __pin_path(self, key: str) -> str:
+        return os.path.join(self.root, "pins", hashlib.sha1(key.encode()).hexdigest())
+
+    def __pinned_objects(self) -> Set[str]:
+        pinned = set()
+        for entry in os.scandir(os.path.join(self.root, "pins")):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                with open(entry.path) as pin:
+                    pinned.add(pin.read().strip())
+            except FileNotFoundError:
+                continue
+        return pinned
+
+    def __object_path(self, key: str) -> Optional[str]:
+        try:
+            with open(self.__ref_path(key)) as ref:
+                return os.path.join(self.root, "objects", ref.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def __write_ref(self, key: str, object_name: str):
+        self.__write_file(self.__ref_path(key), object_name)
+
+    @staticmethod
+    def __write_file(path: str, content: str):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(content)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def __link(source: str, link_path: str) -> str:
+        # rename() does nothing when both names are links to the same file
+        if os.path.exists(link_path) and os.path.samefile(source, link_path):
+            return link_path
+        temp_path = f"{link_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(source, temp_path)
+        except OSError as err:
+            if err.errno != errno.EXDEV:
+                raise err
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, link_path)
+        return link_path
+
+    @staticmethod
+    def __file_digest(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
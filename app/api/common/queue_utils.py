@@ -0,0 +1,68 @@
+import logging
+from typing import Dict, List
+
+from redis import Redis
+from rq import Queue, Worker
+from rq.job import Job
+from rq.registry import FailedJobRegistry, FinishedJobRegistry, StartedJobRegistry
+from rq.utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+def get_queue_metrics(
+    queue_names: List[str], connection: Redis, sample_size: int = 20
+) -> List[Dict[str, object]]:
+    """
+    A function that collects the load of every given RQ queue, to size the workers of each stage.
+
+    Args:
+    queue_names (List[str]): The names of the queues, in the order they should be reported.
+    connection (Redis): The Redis connection used by the queues.
+    sample_size (int): The number of recently finished jobs used for the average wait time.
+
+    Returns:
+    List[Dict[str, object]]: For every queue, the number of queued, started, finished and failed jobs,
+    the number of workers listening on it, how long the oldest queued job has been waiting and the
+    average time the recently finished jobs waited before a worker started them (both in seconds).
+
+    Example usage:
+    metrics = get_queue_metrics(["conversion", "extraction"], conn)
+    """
+
+    now = utcnow()
+    metrics = []
+    for name in queue_names:
+        queue = Queue(name, connection=connection)
+
+        # The queue is FIFO, so its first job is the one that has waited the longest
+        oldest_wait = 0.0
+        oldest_ids = queue.get_job_ids(0, 1)
+        if len(oldest_ids) > 0:
+            oldest_job = queue.fetch_job(oldest_ids[0])
+            if oldest_job is not None and oldest_job.enqueued_at is not None:
+                oldest_wait = (now - oldest_job.enqueued_at).total_seconds()
+
+        # Wait time of the jobs that finished most recently, from enqueueing until a worker started them
+        finished_registry = FinishedJobRegistry(queue=queue)
+        finished_ids = finished_registry.get_job_ids(-sample_size, -1)
+        waits = [
+            (job.started_at - job.enqueued_at).total_seconds()
+            for job in Job.fetch_many(finished_ids, connection=connection)
+            if job is not None and job.started_at is not None and job.enqueued_at is not None
+        ]
+
+        metrics.append(
+            {
+                "queue": name,
+                "queued": queue.count,
+                "started": StartedJobRegistry(queue=queue).count,
+                "finished": finished_registry.count,
+                "failed": FailedJobRegistry(queue=queue).count,
+                "workers": Worker.count(queue=queue),
+                "oldest_wait_seconds": round(oldest_wait, 2),
+                "average_wait_seconds": round(sum(waits) / len(waits), 2) if len(waits) > 0 else 0.0,
+            }
+        )
+
+    return metrics
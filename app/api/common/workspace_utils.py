@@ -0,0 +1,89 @@
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from uuid import uuid4
+
+from ai_utils.storage import FrameStore
+from config import FRAME_STORE_PATH, UPLOAD_PATH, WORKSPACE_MAX_AGE_HOURS
+
+logger = logging.getLogger(__name__)
+
+
+def get_directory_size(path: str) -> int:
+    """Return the total size in bytes of the files under a directory."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except FileNotFoundError:
+                continue
+    return size
+
+
+class WorkspaceManager(object):
+    """Allocates an isolated scratch directory for every job under one root directory.
+
+    Every workspace gets a unique name, so any number of jobs on the same host can write their
+    intermediate files without overwriting each other. A workspace is deleted when its job ends,
+    whether the job succeeded or failed. Workspaces of jobs that were killed before they could
+    clean up are deleted once they are older than max_age_seconds.
+    """
+
+    def __init__(self, root: str, max_age_seconds: float):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, name: str) -> str:
+        """Create a new empty workspace for the named job and return its path."""
+        self.cleanup_stale()
+        path = os.path.join(self.root, f"{name}_{uuid4().hex[:12]}")
+        os.makedirs(path)
+        return path
+
+    def release(self, path: str):
+        """Log how much disk space the workspace used and delete it."""
+        size = get_directory_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Workspace {os.path.basename(path)} used {size / (1024 * 1024)} MB of disk.")
+
+    @contextmanager
+    def workspace(self, name: str) -> Iterator[str]:
+        """Create a workspace for the duration of the with block and delete it afterwards."""
+        path = self.create(name)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def cleanup_stale(self):
+        """Delete the workspaces older than max_age_seconds, left behind by killed jobs."""
+        now = time.time()
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_dir() and now - entry.stat().st_mtime > self.max_age_seconds:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    logger.info(f"Deleted stale workspace {entry.name}.")
+            except FileNotFoundError:
+                continue
+
+    def get_usage(self) -> Dict[str, int]:
+        """Return the number of workspaces in use and the disk space they take."""
+        workspaces = [entry.path for entry in os.scandir(self.root) if entry.is_dir()]
+        return {
+            "workspaces": len(workspaces),
+            "size_bytes": sum(get_directory_size(path) for path in workspaces),
+        }
+
+
+# Scratch directories of the pipeline jobs running on this host
+JOB_WORKSPACES = WorkspaceManager(
+    os.path.join(UPLOAD_PATH, "workspaces"), WORKSPACE_MAX_AGE_HOURS * 3600
+)
+
+# Keyframes handed from the extraction to the moderation stage running on this host
+FRAME_STORE = FrameStore(FRAME_STORE_PATH, WORKSPACE_MAX_AGE_HOURS * 3600)
@@ -6,27 +6,27 @@ from typing import Dict
 
 import pytz
 from flask import Blueprint, make_response, request
-from rq import Queue
 
 from app.api.common.wrapper_utils import is_admin, token_required
 from app.api.exceptions import ApplicationException
-from app.api.moderation.moderation_job import extract_frames, save_file
+from app.api.moderation.moderation_job import save_file
+from app.api.moderation.moderation_pipeline import enqueue_pipeline, resume_pipeline
 from app.api.moderation.moderation_service import (
     generate_pdf_report,
     get_by_params,
     get_count_by_params,
+    get_media_cache_statistics,
     get_monthly_statistics,
-    moderate_video,
+    get_queue_statistics,
+    get_workspace_statistics,
     start_moderation,
     validate_moderation,
 )
 from app.dto import BaseResponse, PaginateResponse, UploadInfo, User
 from config import DATABASE, UPLOAD_PATH
-from redis_worker import conn
 
 logger = logging.getLogger(__name__)
 moderation_bp = Blueprint("moderation", __name__)
-redis_conn = Queue(connection=conn)
 
 
 # get moderations by parameters
@@ -169,22 +169,13 @@ def create_moderation(current_user: User):
         # Call the save_file function to save the uploaded file
         upload_info, video_metadata = save_file(upload_info)
 
-        # Enqueue a job to extract frames from the uploaded video
-        job = redis_conn.enqueue_call(
-            func=extract_frames, args=(upload_info, video_metadata), timeout=1800
-        )
-        logger.info(
-            "Job %s queued || Extracting Frames %s", job.id, upload_info.saved_id
-        )
-
-        # If the 'process_now' form data is set to 'true', enqueue a job to analyze the video using models
+        # Enqueue the conversion, upload and frame extraction of the uploaded video, each job waiting for the ones it needs.
+        # If the 'process_now' form data is set to 'true', the moderation using models is chained after them,
+        # with the audio moderated as soon as it is converted
+        stages = ["conversion", "audio_upload", "upload", "extraction"]
         if form_data["process_now"] == "true":
-            job = redis_conn.enqueue_call(
-                func=moderate_video, args=(upload_info, video_metadata), timeout=7200
-            )
-            logger.info(
-                "Job %s queued || Moderating Video %s", job.id, upload_info.saved_id
-            )
+            stages += ["audio", "moderation"]
+        enqueue_pipeline(upload_info, video_metadata, stages)
 
         # Set the response to indicate that the form was successfully uploaded
         response.set_response(upload_info.saved_id, HTTPStatus.OK)
@@ -227,6 +218,29 @@ def initiate_moderation(_, moderation_id):
     return response.get_response()
 
 
+# handle resuming a failed moderation pipeline from its first unfinished stage
+@moderation_bp.route("/moderations/<moderation_id>/resume", methods=["PUT"])
+@token_required
+def resume_moderation(_, moderation_id):
+    response = BaseResponse()
+
+    try:
+        resume_pipeline(moderation_id)
+        response.set_response("Moderasi Dilanjutkan", HTTPStatus.OK)
+
+    except (Exception, ApplicationException) as err:
+        logger.error(str(err))
+
+        if isinstance(err, ApplicationException):
+            response.set_response(str(err), err.status)
+        else:
+            response.set_response(
+                "Internal server error", HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+
+    return response.get_response()
+
+
 # get moderation statistics
 @moderation_bp.route("/moderations/statistics", methods=["GET"])
 @token_required
@@ -293,6 +307,75 @@ def moderation_statistic(_):
     return response.get_response()
 
 
+# get depth and wait time of the job queues of every pipeline stage
+@moderation_bp.route("/moderations/queues", methods=["GET"])
+@token_required
+@is_admin
+def moderation_queue_statistic(_):
+    response = BaseResponse()
+
+    try:
+        response.set_response(get_queue_statistics(), HTTPStatus.OK)
+
+    except (Exception, ApplicationException) as err:
+        logger.error(str(err))
+
+        if isinstance(err, ApplicationException):
+            response.set_response(str(err), err.status)
+        else:
+            response.set_response(
+                "Internal server error", HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+
+    return response.get_response()
+
+
+# get hit and miss counters and size of the local media cache
+@moderation_bp.route("/moderations/cache", methods=["GET"])
+@token_required
+@is_admin
+def moderation_cache_statistic(_):
+    response = BaseResponse()
+
+    try:
+        response.set_response(get_media_cache_statistics(), HTTPStatus.OK)
+
+    except (Exception, ApplicationException) as err:
+        logger.error(str(err))
+
+        if isinstance(err, ApplicationException):
+            response.set_response(str(err), err.status)
+        else:
+            response.set_response(
+                "Internal server error", HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+
+    return response.get_response()
+
+
+# get number and disk usage of the job workspaces
+@moderation_bp.route("/moderations/workspaces", methods=["GET"])
+@token_required
+@is_admin
+def moderation_workspace_statistic(_):
+    response = BaseResponse()
+
+    try:
+        response.set_response(get_workspace_statistics(), HTTPStatus.OK)
+
+    except (Exception, ApplicationException) as err:
+        logger.error(str(err))
+
+        if isinstance(err, ApplicationException):
+            response.set_response(str(err), err.status)
+        else:
+            response.set_response(
+                "Internal server error", HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+
+    return response.get_response()
+
+
 # generate a PDF report for a moderation
 @moderation_bp.route("/moderations/<moderation_id>/report", methods=["GET"])
 @token_required
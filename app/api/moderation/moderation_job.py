@@ -1,28 +1,39 @@
 import logging
 import math
 import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from http import HTTPStatus
 from json import loads
 from math import ceil, floor
 from typing import Tuple
+from uuid import uuid4
 
 import ffmpeg
 import requests
 from bson.objectid import ObjectId
 from flask import request
-from moviepy.editor import VideoFileClip
-from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_audio, ffmpeg_extract_subclip
-from rq import Queue
+from rq import Queue, get_current_job
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
 
-from ai_utils.detect import detect_objects, transcribe_gcs
+from ai_utils.detect import BLACKLISTED_WORDS, detect_objects, detect_objects_remote, transcribe_gcs
 from ai_utils.extract import keyframe_detection
+from ai_utils.extract.keyframe_upload import FrameStoreDestination, upload_stored_keyframes
+from ai_utils.extract.media_transcode import transcode_video_extract_audio
+from ai_utils.extract.video_clips import clip_windows, iter_cut_clips, merge_windows
+from ai_utils.speech import get_recognizer, iter_audio_violations, split_audio
 from app.api.common.gcloud_utils import (
+    MEDIA_CACHE,
     delete_file_gcloud,
     download_files_gcloud,
-    upload_to_gcloud,
+    fetch_file_gcloud,
+    upload_to_gcloud_with_retry,
 )
 from app.api.common.string_utils import tokenize_string
+from app.api.common.workspace_utils import FRAME_STORE, JOB_WORKSPACES
 from app.api.exceptions import ApplicationException
 from app.api.station.station_service import create_station
 from app.dto import (
@@ -31,25 +42,129 @@ from app.dto import (
     ModerationDecision,
     ModerationResult,
     ModerationStatus,
+    PipelineStatus,
     Station,
     UploadInfo,
 )
 from config import (
+    AUDIO_RECOGNIZER,
     DATABASE,
+    EXTRACTION_WORKERS,
     GOOGLE_BUCKET_NAME,
     GOOGLE_EXTRACT_FRAME_URL,
     GOOGLE_MODERATE_AUDIO_URL,
     GOOGLE_STORAGE_CLIENT,
     UPLOAD_PATH,
+    USE_FRAME_STORE,
     USE_GOOGLE_FUNCTIONS,
+    USE_INFERENCE_WORKER,
+    VOSK_MODEL_PATH,
 )
-from redis_worker import conn
+from redis_worker import conn, conversion_queue, inference_queue
 
-redis_conn = Queue(connection=conn)
+inference_conn = Queue(inference_queue, connection=conn)
+frame_upload_conn = Queue(conversion_queue, connection=conn)
 logger = logging.getLogger(__name__)
 MODERATION_DB = DATABASE["moderation"]
 STATION_DB = DATABASE["stations"]
 
+# Clips Cut Per ffmpeg Run And Clips Uploaded At The Same Time While The Next Batch Is Cut
+CLIP_CUT_BATCH_SIZE = 8
+CLIP_UPLOAD_WORKERS = 4
+
+# Seconds Between Two Checks Of The Audio Stage While The Moderation Waits For It, And How Long It Waits At Most,
+# Which Is Also The Timeout Of The Request To The Audio Moderation Function
+AUDIO_POLL_SECONDS = 2
+AUDIO_WAIT_TIMEOUT = 3600
+
+# Seconds Between Two Checks Of The Background Keyframe Upload While The Moderation Waits For It, And How Long At Most
+FRAME_UPLOAD_POLL_SECONDS = 2
+FRAME_UPLOAD_WAIT_TIMEOUT = 3600
+
+# Seconds Between Two Checks Of A Media Upload Stage While A Stage That Missed The Media Cache Waits For It, And How Long At Most
+MEDIA_UPLOAD_POLL_SECONDS = 2
+MEDIA_UPLOAD_WAIT_TIMEOUT = 3600
+
+# Pipeline Stages In The Order They Are Enqueued, Each One Checkpoints Its Progress In The Moderation Document
+PIPELINE_STAGES = ["conversion", "audio_upload", "upload", "audio", "extraction", "moderation"]
+
+# Stages Each Stage Waits For. The Uploads To Google Cloud Storage Run In The Background Next To The
+# Extraction, Which Reads The Video From The Local Media Cache, Unless Google Functions Do The Extraction.
+# The mp3 Is Uploaded On Its Own Ahead Of The Video, So The Audio Is Moderated As Soon As It Is Available,
+# Next To The Extraction, And Joined By The Moderation
+STAGE_DEPENDENCIES = {
+    "conversion": [],
+    "audio_upload": ["conversion"],
+    "upload": ["conversion"],
+    "audio": ["conversion", "audio_upload"] if AUDIO_RECOGNIZER == "function" else ["conversion"],
+    "extraction": ["conversion", "upload"] if USE_GOOGLE_FUNCTIONS else ["conversion"],
+    "moderation": ["extraction", "audio_upload", "upload"],
+}
+
+
+# Record The Status And Outputs Of A Pipeline Stage In The Moderation Document
+def update_stage(moderation_id: str, stage: str, status: PipelineStatus, **outputs):
+    fields = {f"pipeline.{stage}.{key}": value for key, value in outputs.items()}
+    fields[f"pipeline.{stage}.status"] = str(status)
+    fields[f"pipeline.{stage}.updated_at"] = datetime.utcnow()
+    MODERATION_DB.update_one({"_id": ObjectId(moderation_id)}, {"$set": fields})
+
+
+# Checkpoint A Completed Step Of A Pipeline Stage Together With Its Outputs
+def complete_step(moderation_id: str, stage: str, step: str, **outputs):
+    fields = {f"pipeline.{stage}.{key}": value for key, value in outputs.items()}
+    fields[f"pipeline.{stage}.updated_at"] = datetime.utcnow()
+    MODERATION_DB.update_one(
+        {"_id": ObjectId(moderation_id)},
+        {"$set": fields, "$addToSet": {f"pipeline.{stage}.steps": step}},
+    )
+
+
+# Mark A Queued Stage As Running In The Given Job, Returning False If It Was Not Queued Anymore. Stages That Can Be
+# Started By Their Own Job Or By A Later Stage Waiting For Them Claim Themselves, So They Only Run Once
+def claim_stage(moderation_id: str, stage: str, runner_id: str) -> bool:
+    return __claim_stage({f"pipeline.{stage}.status": str(PipelineStatus.QUEUED)}, moderation_id, stage, runner_id)
+
+
+# Take Over A Stage Left Running By A Job That Has Ended, Returning False If Another Job Took It Over First
+def reclaim_stage(moderation_id: str, stage: str, stale_runner_id: str, runner_id: str) -> bool:
+    query = {
+        f"pipeline.{stage}.status": str(PipelineStatus.RUNNING),
+        f"pipeline.{stage}.runner_id": stale_runner_id,
+    }
+    return __claim_stage(query, moderation_id, stage, runner_id)
+
+
+def __claim_stage(query: dict, moderation_id: str, stage: str, runner_id: str) -> bool:
+    result = MODERATION_DB.update_one(
+        {"_id": ObjectId(moderation_id), **query},
+        {
+            "$set": {
+                f"pipeline.{stage}.status": str(PipelineStatus.RUNNING),
+                f"pipeline.{stage}.runner_id": runner_id,
+                f"pipeline.{stage}.updated_at": datetime.utcnow(),
+            }
+        },
+    )
+    return result.modified_count == 1
+
+
+# Return Whether The Job Running A Stage Is Still Running. A Stage Is Left Running When Its Job Was Killed,
+# E.g. The Work-Horse Of A Forking Worker That Exited Or Timed Out
+def is_runner_alive(runner_id: str) -> bool:
+    try:
+        return Job.fetch(runner_id or "", connection=conn).get_status() == JobStatus.STARTED
+    except NoSuchJobError:
+        return False
+
+
+# Return The Checkpoint Of A Pipeline Stage, Or An Empty Dict If It Has Not Run Yet
+def get_stage(moderation_id: str, stage: str) -> dict:
+    document = MODERATION_DB.find_one({"_id": ObjectId(moderation_id)}, {"pipeline": 1})
+    if document is None:
+        return {}
+    return (document.get("pipeline") or {}).get(stage) or {}
+
 
 def convert_duration_to_seconds(duration_time):
     hours, minutes, seconds = map(float, duration_time.split(":"))
@@ -115,48 +230,146 @@ def extract_metadata(upload_info: UploadInfo) -> dict:
         raise err
 
 
-def convert_video_extract_audio(upload_info: UploadInfo) -> bool:
+def convert_video_extract_audio(upload_info: UploadInfo, workdir: str = UPLOAD_PATH) -> dict:
     try:
-        # Convert Video Format to mp4 if necessary
+        # Convert Video Format to mp4 if necessary, In The Same ffmpeg Run As The Audio Extraction
+        mp4_save_path = None
         if not upload_info.file_ext.lower() == "mp4":
             logger.info("Converting video to mp4")
-            mp4_save_path = os.path.join(UPLOAD_PATH, upload_info.filename + ".mp4")
-            video_clip = VideoFileClip(upload_info.video_save_path)
-            video_clip.write_videofile(mp4_save_path, codec="libx264")
-            video_clip.close()
+            mp4_save_path = os.path.join(workdir, upload_info.filename + ".mp4")
+        audio_save_path = os.path.join(workdir, upload_info.filename + ".mp3")
+
+        # Report The Conversion Progress In The Moderation Document Every 10 Percent
+        reported = 0.0
+
+        def report_progress(fraction):
+            nonlocal reported
+            if fraction - reported >= 0.1 or (fraction == 1.0 and reported < 1.0):
+                reported = fraction
+                MODERATION_DB.update_one(
+                    {"_id": ObjectId(upload_info.saved_id)},
+                    {"$set": {"pipeline.conversion.progress": round(fraction, 2)}},
+                )
 
-            # Remove the original video file
-            os.remove(upload_info.video_save_path)
+        conversion = transcode_video_extract_audio(
+            upload_info.video_save_path, audio_save_path, mp4_save_path, report_progress
+        )
+        logger.info(
+            f"Conversion (video {conversion['video_output']}, audio {conversion['audio_output']}) "
+            f"of {upload_info.file_with_ext} took {conversion['seconds']} seconds."
+        )
 
+        if mp4_save_path is not None:
             # Update the upload_info with the new video save path
             upload_info.file_ext = "mp4"
             upload_info.file_with_ext = upload_info.filename + ".mp4"
             upload_info.video_save_path = mp4_save_path
 
-        ffmpeg_extract_audio(
-            upload_info.video_save_path, f"{UPLOAD_PATH}/{upload_info.filename}.mp3"
-        )
-        upload_info.audio_save_path = f"{UPLOAD_PATH}/{upload_info.filename}.mp3"
-        return True
+        upload_info.audio_save_path = audio_save_path
+        return conversion
     except Exception as err:
         logger.error(str(err))
         raise err
 
 
-def convert_and_upload_to_gcloud(upload_info: UploadInfo):
-    convert_video_extract_audio(upload_info)
-    logger.info(upload_info)
+# Convert The Video And Keep It With Its Audio In The Local Media Cache For The Next Stages
+def convert_media(upload_info: UploadInfo):
+    try:
+        update_stage(upload_info.saved_id, "conversion", PipelineStatus.RUNNING)
+        steps = get_stage(upload_info.saved_id, "conversion").get("steps", [])
+
+        # Skip The Conversion If A Previous Run Already Put Its Files In The Media Cache
+        if "convert" not in steps:
+            with JOB_WORKSPACES.workspace(f"conversion_{upload_info.saved_id}") as workdir:
+                source_path = upload_info.video_save_path
+                conversion = convert_video_extract_audio(upload_info, workdir)
+                logger.info(upload_info)
+
+                # Put The Video And Audio Files Into The Media Cache Under Their Bucket Paths, Pinned Until
+                # The Upload Stage Has Them In Google Cloud Storage. The Original Upload Is Kept Until Then
+                vid_bucket_path = f"uploads/{upload_info.user_id}_{upload_info.file_with_ext}"
+                aud_bucket_path = f"uploads/{upload_info.user_id}_{upload_info.filename}.mp3"
+                MEDIA_CACHE.put(
+                    vid_bucket_path,
+                    upload_info.video_save_path,
+                    move=upload_info.video_save_path != source_path,
+                    pinned=True,
+                )
+                MEDIA_CACHE.put(aud_bucket_path, upload_info.audio_save_path, pinned=True)
+                complete_step(
+                    upload_info.saved_id,
+                    "conversion",
+                    "convert",
+                    upload_info=upload_info.__dict__,
+                    conversion=conversion,
+                    source_path=source_path,
+                    video_path=vid_bucket_path,
+                    audio_path=aud_bucket_path,
+                )
 
-    # Upload The Video and Audio To Google Cloud Storage
-    vid_bucket_path = f"uploads/{upload_info.user_id}_{upload_info.file_with_ext}"
-    upload_to_gcloud(vid_bucket_path, upload_info.video_save_path)
+        update_stage(upload_info.saved_id, "conversion", PipelineStatus.DONE)
+    except Exception as err:
+        logger.error(str(err))
+        update_stage(upload_info.saved_id, "conversion", PipelineStatus.FAILED, error=str(err))
+        raise err
 
-    aud_bucket_path = f"uploads/{upload_info.user_id}_{upload_info.filename}.mp3"
-    upload_to_gcloud(aud_bucket_path, upload_info.audio_save_path)
 
-    # Delete The Local Video And Audio Files
-    os.remove(upload_info.video_save_path)
-    os.remove(upload_info.audio_save_path)
+# Upload A Converted File From The Media Cache To Google Cloud Storage As The Only Step Of A Stage,
+# Then Let The Cache Evict It
+def upload_cached_media(upload_info: UploadInfo, stage: str, step: str, bucket_path: str):
+    try:
+        update_stage(upload_info.saved_id, stage, PipelineStatus.RUNNING)
+        if step not in get_stage(upload_info.saved_id, stage).get("steps", []):
+            cached_path = MEDIA_CACHE.get(bucket_path)
+            if cached_path is None:
+                raise Exception(f"{bucket_path} is no longer in the media cache")
+            # Raise When Every Attempt Failed, So The Stage Fails Instead Of Checkpointing A Missing Blob
+            upload_to_gcloud_with_retry(bucket_path, cached_path)
+            complete_step(upload_info.saved_id, stage, step)
+        MEDIA_CACHE.unpin(bucket_path)
+        update_stage(upload_info.saved_id, stage, PipelineStatus.DONE)
+    except Exception as err:
+        logger.error(str(err))
+        update_stage(upload_info.saved_id, stage, PipelineStatus.FAILED, error=str(err))
+        raise err
+
+
+# Upload The Converted Audio To Google Cloud Storage, Ahead Of The Much Larger Video
+def upload_audio_to_gcloud(upload_info: UploadInfo):
+    conversion = get_stage(upload_info.saved_id, "conversion")
+    upload_cached_media(upload_info, "audio_upload", "upload_audio", conversion["audio_path"])
+
+
+# Upload The Converted Video To Google Cloud Storage, Then Delete The Original Upload
+def upload_media_to_gcloud(upload_info: UploadInfo):
+    conversion = get_stage(upload_info.saved_id, "conversion")
+    upload_cached_media(upload_info, "upload", "upload_video", conversion["video_path"])
+    source_path = conversion.get("source_path")
+    if source_path is not None and os.path.exists(source_path):
+        os.remove(source_path)
+
+
+# Wait Until A Media Upload Stage Is Done, Raising If It Failed. Moderations Created Before The Pipeline
+# Have No Upload Stages, Their Media Was Uploaded Right Away
+def wait_for_media_upload(moderation_id: str, stage: str):
+    start_time = time.time()
+    while True:
+        status = get_stage(moderation_id, stage).get("status")
+        if status in [None, str(PipelineStatus.DONE)]:
+            return
+        if status == str(PipelineStatus.FAILED):
+            raise Exception(f"The {stage} stage failed, the media is not in Google Cloud Storage")
+        if time.time() - start_time > MEDIA_UPLOAD_WAIT_TIMEOUT:
+            raise Exception(f"Timed out waiting for the {stage} stage")
+        time.sleep(MEDIA_UPLOAD_POLL_SECONDS)
+
+
+# Link A Converted File Into The Workdir From The Media Cache Of This Host, Or Download It Once Its Upload Stage
+# Is Done. Stages Reading The Cache Do Not Wait For The Uploads, So On Another Host The Blob May Not Be There Yet
+def fetch_uploaded_media(moderation_id: str, stage: str, bucket_path: str, workdir: str) -> str:
+    if MEDIA_CACHE.get(bucket_path) is None:
+        wait_for_media_upload(moderation_id, stage)
+    return fetch_file_gcloud(bucket_path, workdir)
 
 
 # Create New Moderation In DB
@@ -183,15 +396,6 @@ def save_file(upload_info: UploadInfo) -> Tuple[UploadInfo, dict]:
     file.save(upload_info.video_save_path)
     video_metadata = extract_metadata(upload_info)
 
-    job = redis_conn.enqueue_call(
-        func=convert_and_upload_to_gcloud, args=([upload_info]), timeout=3600
-    )
-    logger.info(
-        "Job %s queued || Convert Video and Extract Audio %s",
-        job.id,
-        upload_info.filename,
-    )
-
     # If The Video Metadata Is None, Raise A 400 Exception
     if video_metadata is None:
         raise ApplicationException(
@@ -248,6 +452,7 @@ def save_file(upload_info: UploadInfo) -> Tuple[UploadInfo, dict]:
 # Extract Frames From The Uploaded Video And Upload Them To Google Cloud Storage
 def extract_frames(upload_info: UploadInfo, metadata):
     try:
+        update_stage(upload_info.saved_id, "extraction", PipelineStatus.RUNNING)
         video_path = f"uploads/{upload_info.user_id}_{upload_info.filename}.mp4"
         payload = {
             "filename": f"{upload_info.filename}.mp4",
@@ -255,19 +460,34 @@ def extract_frames(upload_info: UploadInfo, metadata):
             "user_id": upload_info.user_id,
         }
 
+        # Keep The Keyframes On This Host When The Moderation Is Queued Right After The Extraction,
+        # So It Reads Them Without The JPEG Round-Trip And They Are Uploaded In The Background
+        use_frame_store = (
+            USE_FRAME_STORE
+            and not USE_GOOGLE_FUNCTIONS
+            and get_stage(upload_info.saved_id, "moderation").get("status") == str(PipelineStatus.QUEUED)
+        )
+
         if USE_GOOGLE_FUNCTIONS:
             req_response = requests.post(GOOGLE_EXTRACT_FRAME_URL, payload)
             frame_results = loads(str(req_response.json()).replace("'", '"'))
         else:
             bucket = GOOGLE_STORAGE_CLIENT.bucket(GOOGLE_BUCKET_NAME)
-            source_blob = bucket.get_blob(video_path)
-            frame_results = keyframe_detection(
-                upload_info.user_id,
-                f"{upload_info.filename}.mp4",
-                source_blob,
-                bucket,
-                0.4,
-            )
+            source_blob = bucket.blob(video_path)
+            with JOB_WORKSPACES.workspace(f"extraction_{upload_info.saved_id}") as workdir:
+                frame_results = keyframe_detection(
+                    upload_info.user_id,
+                    f"{upload_info.filename}.mp4",
+                    source_blob,
+                    FrameStoreDestination(FRAME_STORE, upload_info.saved_id) if use_frame_store else bucket,
+                    0.4,
+                    workers=EXTRACTION_WORKERS,
+                    video_path=fetch_uploaded_media(upload_info.saved_id, "upload", video_path, workdir),
+                    workdir=workdir,
+                )
+
+        if use_frame_store:
+            enqueue_frame_upload(upload_info, frame_results)
 
         # Update The Moderation In The Database To Reference The Uploaded Frames And Set Its Status To Uploaded
         MODERATION_DB.update_one(
@@ -280,16 +500,203 @@ def extract_frames(upload_info: UploadInfo, metadata):
             },
         )
 
+        update_stage(
+            upload_info.saved_id, "extraction", PipelineStatus.DONE, frame_store=use_frame_store
+        )
+
+        logger.info("Frames uploaded to gcloud")
+    except Exception as err:
+        logger.error(str(err))
+        # Keep The Moderation So The Pipeline Can Be Resumed From This Stage
+        update_stage(upload_info.saved_id, "extraction", PipelineStatus.FAILED, error=str(err))
+        raise err
+
+
+# Enqueue The Upload Of The Keyframes Kept In The Frame Store, Clearing The Error Of A Previous Attempt
+# So The Moderation Waits For This One. Its Job Is Recorded In The Extraction Stage To Resume It If It Fails
+def enqueue_frame_upload(upload_info: UploadInfo, frame_results) -> Job:
+    job_id = str(uuid4())
+    MODERATION_DB.update_one(
+        {"_id": ObjectId(upload_info.saved_id)},
+        {
+            "$set": {
+                "pipeline.extraction.upload_frames_error": None,
+                "pipeline.extraction.upload_frames_job_id": job_id,
+            }
+        },
+    )
+    job = frame_upload_conn.enqueue_call(
+        func=upload_frames, args=(upload_info, frame_results), timeout=3600, job_id=job_id
+    )
+    logger.info("Job %s queued || Upload Frames %s", job.id, upload_info.saved_id)
+    return job
+
+
+# Upload The Keyframes Kept In The Frame Store, Only Needed To Show Them On The Dashboard
+def upload_frames(upload_info: UploadInfo, frame_results):
+    try:
+        bucket = GOOGLE_STORAGE_CLIENT.bucket(GOOGLE_BUCKET_NAME)
+        upload_stored_keyframes(bucket, FRAME_STORE, upload_info.saved_id, frame_results)
+        complete_step(upload_info.saved_id, "extraction", "upload_frames", upload_frames_error=None)
         logger.info("Frames uploaded to gcloud")
     except Exception as err:
+        # Keep The Keyframes In The Frame Store, They Are The Only Copy Until An Upload Succeeds
         logger.error(str(err))
-        MODERATION_DB.delete_one({"_id": ObjectId(upload_info.saved_id)})
+        MODERATION_DB.update_one(
+            {"_id": ObjectId(upload_info.saved_id)},
+            {"$set": {"pipeline.extraction.upload_frames_error": str(err)}},
+        )
         raise err
+    FRAME_STORE.release(upload_info.saved_id, "upload")
+
+
+# Wait Until The Keyframes Kept In The Frame Store Of The Extraction Host Are Uploaded, Raising If The Upload Failed
+def wait_for_frame_upload(moderation_id: str):
+    start_time = time.time()
+    while True:
+        extraction = get_stage(moderation_id, "extraction")
+        if "upload_frames" in extraction.get("steps", []):
+            return
+        if extraction.get("upload_frames_error") is not None:
+            raise Exception(f"Upload of the keyframes failed: {extraction['upload_frames_error']}")
+        if time.time() - start_time > FRAME_UPLOAD_WAIT_TIMEOUT:
+            raise Exception("Timed out waiting for the upload of the keyframes")
+        time.sleep(FRAME_UPLOAD_POLL_SECONDS)
+
+
+# Cut The Clips In Batches And Upload Each Batch On A Pool Of Threads While The Next One Is Cut,
+# Returning For Every Clip Its Bucket Path And How Long Cutting And Uploading It Took
+def publish_clips(upload_info: UploadInfo, video_path: str, clips: list, workdir: str) -> list:
+    clip_path = os.path.join(workdir, upload_info.filename)
+    bucket_path = f"moderation/{upload_info.user_id}/{upload_info.filename}/videos/{upload_info.user_id}_{upload_info.filename}"
+
+    def upload_clip(clip: dict) -> dict:
+        start_time = time.time()
+        size = os.path.getsize(clip["path"])
+        clip_url = f"{bucket_path}_{clip['index']}.mp4"
+        attempts = upload_to_gcloud_with_retry(clip_url, clip["path"])
+        os.remove(clip["path"])
+        return {
+            "index": clip["index"],
+            "clip_url": clip_url,
+            "start": clip["start"],
+            "end": clip["end"],
+            "mode": clip["mode"],
+            "bytes": size,
+            "cut_seconds": clip["batch_seconds"],
+            "upload_seconds": time.time() - start_time,
+            "upload_attempts": attempts,
+        }
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=CLIP_UPLOAD_WORKERS) as executor:
+        for batch in iter_cut_clips(
+            video_path,
+            clips,
+            [f"{clip_path}_{idx}.mp4" for idx in range(len(clips))],
+            batch_size=CLIP_CUT_BATCH_SIZE,
+        ):
+            futures += [executor.submit(upload_clip, clip) for clip in batch]
+        return [future.result() for future in futures]
+
+
+# Detect The Blacklisted Words Spoken In The Audio Of The Video, Either Through The Audio Moderation
+# Cloud Function Or With The Recognizer Of This Worker Process, Whose Model Stays Loaded Between Jobs
+def moderate_audio(upload_info: UploadInfo) -> list:
+    audio_bucket_path = f"uploads/{upload_info.user_id}_{upload_info.filename}.mp3"
+    if AUDIO_RECOGNIZER == "function":
+        req_response: requests.Response = requests.post(
+            GOOGLE_MODERATE_AUDIO_URL, {"audio_path": audio_bucket_path}, timeout=AUDIO_WAIT_TIMEOUT
+        )
+        if req_response.status_code != 200:
+            raise Exception("Error in audio moderation")
+        return loads(str(req_response.json()).replace("'", '"'))['data']
+
+    # Transcribe The Cached Audio In Overlapping Chunks, Streaming Every Chunk Into The Blacklist Matcher
+    recognizer = get_recognizer(AUDIO_RECOGNIZER, VOSK_MODEL_PATH)
+    with JOB_WORKSPACES.workspace(f"audio_{upload_info.saved_id}") as workdir:
+        audio_save_path = fetch_uploaded_media(upload_info.saved_id, "audio_upload", audio_bucket_path, workdir)
+        return list(
+            iter_audio_violations(split_audio(audio_save_path, workdir), recognizer, BLACKLISTED_WORDS)
+        )
+
+
+# Moderate The Audio Of A Claimed Audio Stage And Record Its Detections And Duration In The Stage
+def run_audio_stage(upload_info: UploadInfo) -> list:
+    try:
+        start_time = time.time()
+        detected_audios = moderate_audio(upload_info)
+        update_stage(
+            upload_info.saved_id,
+            "audio",
+            PipelineStatus.DONE,
+            detected_audios=detected_audios,
+            seconds=time.time() - start_time,
+        )
+        return detected_audios
+    except Exception as err:
+        logger.error(str(err))
+        update_stage(upload_info.saved_id, "audio", PipelineStatus.FAILED, error=str(err))
+        raise err
+
+
+# Audio Stage Job, Started Right After The Conversion. Does Nothing If The Moderation Already Took Over The Stage
+def moderate_audio_stage(upload_info: UploadInfo):
+    if not claim_stage(upload_info.saved_id, "audio", get_current_job().id):
+        logger.info("Audio of %s is already moderated by another job", upload_info.saved_id)
+        return
+    run_audio_stage(upload_info)
+
+
+# Return The Audio Detections Of The Audio Stage Once It Is Done. The Stage Is Run Here, In The Job
+# runner_id, Instead When It Was Not Enqueued, Has Failed, Is Still Waiting For A Worker, Or Its Job Has Ended
+def join_audio_stage(upload_info: UploadInfo, runner_id: str) -> list:
+    start_time = time.time()
+    while True:
+        stage = get_stage(upload_info.saved_id, "audio")
+        status = stage.get("status")
+        if status == str(PipelineStatus.DONE):
+            return stage["detected_audios"]
+        if status == str(PipelineStatus.QUEUED) and claim_stage(upload_info.saved_id, "audio", runner_id):
+            return run_audio_stage(upload_info)
+        if status in [None, str(PipelineStatus.FAILED)]:
+            update_stage(upload_info.saved_id, "audio", PipelineStatus.RUNNING, runner_id=runner_id)
+            return run_audio_stage(upload_info)
+        if (
+            status == str(PipelineStatus.RUNNING)
+            and not is_runner_alive(stage.get("runner_id"))
+            and reclaim_stage(upload_info.saved_id, "audio", stage.get("runner_id"), runner_id)
+        ):
+            logger.info("Audio stage of %s was left running by job %s", upload_info.saved_id, stage.get("runner_id"))
+            return run_audio_stage(upload_info)
+        if time.time() - start_time > AUDIO_WAIT_TIMEOUT:
+            raise Exception("Timed out waiting for the audio moderation")
+        time.sleep(AUDIO_POLL_SECONDS)
 
 
 def moderate_video(upload_info: UploadInfo, metadata):
     initial_data = MODERATION_DB.find_one({"_id": ObjectId(upload_info.saved_id)})
+    initial_data.pop("pipeline", None)
+    workdir = None
+    audio_executor = ThreadPoolExecutor(max_workers=1)
     try:
+        update_stage(upload_info.saved_id, "moderation", PipelineStatus.RUNNING)
+        checkpoint = get_stage(upload_info.saved_id, "moderation")
+        steps = checkpoint.get("steps", [])
+
+        # The Audio And The Video Are Read From And Deleted In Google Cloud Storage, So They Must Be Uploaded.
+        # Moderations Created Before The Pipeline Have No Upload Stages, Their Media Was Uploaded Right Away
+        for stage in ["audio_upload", "upload"]:
+            upload_status = get_stage(upload_info.saved_id, stage).get("status")
+            if upload_status not in [None, str(PipelineStatus.DONE)]:
+                raise Exception(f"The {stage} stage is {upload_status}, the media is not in Google Cloud Storage yet")
+
+        # Keep The Files Of This Job In Its Own Workspace, So Moderations Of Videos With The Same
+        # Filename Running On This Host Never Share Or Delete Each Other's Frames
+        workdir = JOB_WORKSPACES.create(f"moderation_{upload_info.saved_id}")
+        frame_dir = os.path.join(workdir, "frames")
+        os.makedirs(frame_dir, exist_ok=True)
+
         # Update The Status Of The Moderation In The Database To In_Progress
         MODERATION_DB.update_one(
             {"_id": ObjectId(upload_info.saved_id)},
@@ -298,61 +705,109 @@ def moderate_video(upload_info: UploadInfo, metadata):
 
         video_duration = float(metadata[0]["duration"])
 
-        # Download All Frame Files Before Detecting The Frames Using Model
+        # Join The Audio Stage Or Moderate The Audio In The Background While The Frames Are Detected,
+        # Unless A Previous Run Already Did. The Job Is Read Here, rq Only Knows It In This Thread
+        runner_id = get_current_job().id
+
+        def audio_branch():
+            start_time = time.time()
+            return join_audio_stage(upload_info, runner_id), time.time() - start_time
+
+        if "detect_audio" not in steps:
+            audio_future = audio_executor.submit(audio_branch)
+
+        # Reuse The Frame Detections Of A Previous Run If There Are Any
         moderation_data = Moderation.from_document(initial_data)
-        frame_urls = [item["frame_url"] for item in moderation_data.frames]
-        download_files_gcloud(UPLOAD_PATH, frame_urls)
+        if "detect_frames" in steps:
+            detected_frames = [
+                ModerationResult.from_document(item) for item in checkpoint["detected_frames"]
+            ]
+        else:
+            frames_start_time = time.time()
+            # Download The Frame Files Before Detecting The Frames Using Model, Except The Ones
+            # The Extraction Kept In The Frame Store Of This Host
+            frame_urls = [
+                item["frame_url"]
+                for item in moderation_data.frames
+                if not FRAME_STORE.contains(upload_info.saved_id, item["frame_url"])
+            ]
+            # Keyframes Missing From The Frame Store Were Kept By The Extraction On Another Host,
+            # And Are Only In Google Cloud Storage Once Its Background Upload Is Done
+            if len(frame_urls) > 0 and get_stage(upload_info.saved_id, "extraction").get("frame_store"):
+                wait_for_frame_upload(upload_info.saved_id)
+            download_files_gcloud(frame_dir, frame_urls)
+
+            # Detect The Frames Using Model, On The Inference Workers If Enabled
+            if USE_INFERENCE_WORKER:
+                detected_frames = detect_objects_remote(
+                    moderation_data.frames,
+                    inference_conn,
+                    frame_store=FRAME_STORE,
+                    store_key=upload_info.saved_id,
+                    frame_dir=frame_dir,
+                )
+            else:
+                detected_frames = detect_objects(
+                    moderation_data.frames,
+                    frame_store=FRAME_STORE,
+                    store_key=upload_info.saved_id,
+                    frame_dir=frame_dir,
+                )
+            complete_step(
+                upload_info.saved_id,
+                "moderation",
+                "detect_frames",
+                detected_frames=[item.as_dict() for item in detected_frames],
+                frames_seconds=time.time() - frames_start_time,
+            )
+
+        # Wait For The Audio Branch, Or Reuse The Audio Detections Of A Previous Run If There Are Any
+        if "detect_audio" in steps:
+            detected_audios = checkpoint["detected_audios"]
+        else:
+            wait_start_time = time.time()
+            detected_audios, audio_seconds = audio_future.result()
+            complete_step(
+                upload_info.saved_id,
+                "moderation",
+                "detect_audio",
+                detected_audios=detected_audios,
+                audio_seconds=audio_seconds,
+                audio_wait_seconds=time.time() - wait_start_time,
+            )
 
-        # Detect The Frames Using Model
-        detected_frames = detect_objects(moderation_data.frames)
-        payload = {
-            "audio_path": f"uploads/{upload_info.user_id}_{upload_info.filename}.mp3",
-        }
-        req_response: requests.Response = requests.post(GOOGLE_MODERATE_AUDIO_URL, payload)
-        if req_response.status_code != 200:
-            raise Exception("Error in audio moderation")
-        detected_audios = loads(str(req_response.json()).replace("'", '"'))['data']
-        
         detected_violations = combine_detected_results(detected_frames, detected_audios)
         detected_violations = combine_results(detected_violations)
 
-        # Check If The Video File Exists And Download If Not Exists
-        video_save_path = os.path.join(
-            UPLOAD_PATH, f"{upload_info.user_id}_{upload_info.filename}.mp4"
-        )
-        if not os.path.exists(video_save_path):
-            blob_path = f"uploads/{upload_info.user_id}_{upload_info.filename}.mp4"
-            download_files_gcloud(UPLOAD_PATH, [blob_path])
+        # Delete Local Images, They Are Not Needed Once The Frames Are Detected
+        shutil.rmtree(frame_dir, ignore_errors=True)
+        FRAME_STORE.release(upload_info.saved_id, "detection")
 
-        # Clip The Video File Based On The Detected Frames
-        videos_to_delete = []
-        clipped_video_save_path = os.path.join(UPLOAD_PATH, upload_info.filename)
-        for idx, detected in enumerate(detected_violations):
-            start_time = max(0, float(detected.second - 3))
-            end_time = min(video_duration, float(detected.second + 3))
-            ffmpeg_extract_subclip(
-                video_save_path,
-                start_time,
-                end_time,
-                targetname=f"{clipped_video_save_path}_{idx}.mp4",
+        # Clip The Video File Based On The Detected Frames Into The Workspace Of This Job And Upload The Clips,
+        # Overlapping Windows Become One Clip Shared By Their Violations. The Clips Of A Previous Run Are
+        # Reused, They Were Cut From The Same Checkpointed Detections
+        clips, clip_owners = merge_windows(
+            clip_windows([detected.second for detected in detected_violations], video_duration)
+        )
+        if "publish_clips" in steps:
+            published_clips = checkpoint["clips"]
+        else:
+            # Get The Video File From The Media Cache Into The Workspace, Downloading It If It Is Not There
+            video_save_path = fetch_file_gcloud(
+                f"uploads/{upload_info.user_id}_{upload_info.filename}.mp4", workdir
+            )
+            published_clips = publish_clips(upload_info, video_save_path, clips, workdir)
+            complete_step(upload_info.saved_id, "moderation", "publish_clips", clips=published_clips)
+            logger.info(
+                f"Published {len(clips)} clips for {len(detected_violations)} violations, "
+                f"{sum(clip['mode'] == 'copy' for clip in published_clips)} stream copied."
             )
-
-        # Upload The Clipped Video Files To Google Cloud Storage
         for idx, detected in enumerate(detected_violations):
-            videos_to_delete.append(f"{clipped_video_save_path}_{idx}.mp4")
-            bucket_path = f"moderation/{upload_info.user_id}/{upload_info.filename}/videos/{upload_info.user_id}_{upload_info.filename}_{idx}.mp4"
-            detected.clip_url = bucket_path
-            upload_to_gcloud(bucket_path, f"{clipped_video_save_path}_{idx}.mp4")
+            detected.clip_url = published_clips[clip_owners[idx]]["clip_url"]
 
         # Convert From Frameresult Object To Dict
         parsed_result = [item.as_dict() for item in detected_violations]
 
-        # Delete Local Images And Videos
-        for frame in moderation_data.frames:
-            os.remove(f"{UPLOAD_PATH}/{frame['frame_url'].split('/')[-1]}")
-        for video in videos_to_delete:
-            os.remove(video)
-
         # Update Moderation Data
         MODERATION_DB.update_one(
             {"_id": ObjectId(upload_info.saved_id)},
@@ -370,6 +825,7 @@ def moderate_video(upload_info: UploadInfo, metadata):
 
         # Delete The Uploaded Video File From Google Cloud Storage
         delete_file_gcloud(f"uploads/{upload_info.user_id}_{upload_info.filename}.mp4")
+        update_stage(upload_info.saved_id, "moderation", PipelineStatus.DONE)
 
         logger.info("Videos uploaded to gcloud")
     except Exception as err:
@@ -378,7 +834,14 @@ def moderate_video(upload_info: UploadInfo, metadata):
             {"_id": ObjectId(upload_info.saved_id)},
             {"$set": initial_data},
         )
+        update_stage(upload_info.saved_id, "moderation", PipelineStatus.FAILED, error=str(err))
         raise err
+    finally:
+        # A Failed Moderation Still Waits For The Audio Branch, So The Audio Stage Is Recorded Before The Job Ends.
+        # Its Work-Horse Would Otherwise Exit And Kill The Branch, Leaving The Stage Running
+        audio_executor.shutdown(wait=True)
+        if workdir is not None:
+            JOB_WORKSPACES.release(workdir)
 
 
 # Generate HTML Tags To Display The Moderation Result In A PDF Report
@@ -0,0 +1,165 @@
+import logging
+from http import HTTPStatus
+from typing import List, Optional
+from uuid import uuid4
+
+from bson.objectid import ObjectId
+from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+from app.api.exceptions import ApplicationException
+from app.api.moderation.moderation_job import (
+    PIPELINE_STAGES,
+    STAGE_DEPENDENCIES,
+    convert_media,
+    enqueue_frame_upload,
+    extract_frames,
+    moderate_audio_stage,
+    moderate_video,
+    update_stage,
+    upload_audio_to_gcloud,
+    upload_media_to_gcloud,
+)
+from app.dto import Moderation, PipelineStatus, UploadInfo
+from config import DATABASE
+from redis_worker import audio_queue, conn, conversion_queue, extraction_queue, moderation_queue
+
+logger = logging.getLogger(__name__)
+MODERATION_DB = DATABASE["moderation"]
+
+# Job Function, Queue And Timeout Of Every Pipeline Stage
+STAGE_JOBS = {
+    "conversion": (convert_media, Queue(conversion_queue, connection=conn), 3600),
+    "audio_upload": (upload_audio_to_gcloud, Queue(conversion_queue, connection=conn), 3600),
+    "upload": (upload_media_to_gcloud, Queue(conversion_queue, connection=conn), 3600),
+    "audio": (moderate_audio_stage, Queue(audio_queue, connection=conn), 3600),
+    "extraction": (extract_frames, Queue(extraction_queue, connection=conn), 1800),
+    "moderation": (moderate_video, Queue(moderation_queue, connection=conn), 7200),
+}
+
+
+# Return Whether A Job Is Still Waiting For A Worker Or Running
+def is_job_pending(job_id: Optional[str]) -> bool:
+    try:
+        job = Job.fetch(job_id or "", connection=conn)
+    except NoSuchJobError:
+        return False
+    return job.get_status() in (
+        JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED, JobStatus.STARTED
+    )
+
+
+# Return The Job Of A Stage Enqueued Earlier That Has Not Completed Yet, Or None If The Stage Is Done.
+# A Stage That Failed Or Whose Job Is Gone Has To Be Resumed First
+def get_pending_stage_job(moderation_id: str, stage: str) -> Optional[Job]:
+    document = MODERATION_DB.find_one({"_id": ObjectId(moderation_id)}, {"pipeline": 1})
+    checkpoint = ((document or {}).get("pipeline") or {}).get(stage)
+    # Moderations Created Before The Pipeline Have No Checkpoints, Their Media Was Uploaded Right Away
+    if checkpoint is None or checkpoint.get("status") == str(PipelineStatus.DONE):
+        return None
+    try:
+        job = Job.fetch(checkpoint.get("job_id") or "", connection=conn)
+    except NoSuchJobError:
+        job = None
+    if job is None or job.get_status() not in (
+        JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED, JobStatus.STARTED
+    ):
+        raise ApplicationException(
+            f"Tahap {stage} Belum Selesai, Lanjutkan Moderasi Terlebih Dahulu", HTTPStatus.CONFLICT
+        )
+    return job
+
+
+# Enqueue The Given Stages, Each One Depending On The Stages It Waits For, Whether They Are Enqueued
+# Here Or Are Still Pending From An Earlier Call
+def enqueue_pipeline(
+    upload_info: UploadInfo, metadata, stages: List[str] = PIPELINE_STAGES
+) -> List[Job]:
+    jobs = {}
+    for stage in [stage for stage in PIPELINE_STAGES if stage in stages]:
+        func, queue, timeout = STAGE_JOBS[stage]
+        args = (upload_info, metadata) if stage in ["extraction", "moderation"] else (upload_info,)
+        depends_on = [
+            jobs[dependency] if dependency in jobs else get_pending_stage_job(upload_info.saved_id, dependency)
+            for dependency in STAGE_DEPENDENCIES[stage]
+        ]
+        depends_on = [job for job in depends_on if job is not None]
+
+        # Mark The Stage As Queued Before A Worker Can Pick It Up And Mark It As Running
+        job_id = str(uuid4())
+        update_stage(upload_info.saved_id, stage, PipelineStatus.QUEUED, job_id=job_id)
+        job = queue.enqueue_call(
+            func=func,
+            args=args,
+            timeout=timeout,
+            depends_on=depends_on if len(depends_on) > 0 else None,
+            job_id=job_id,
+        )
+        logger.info("Job %s queued || Pipeline Stage %s %s", job.id, stage, upload_info.saved_id)
+        jobs[stage] = job
+
+    # Keep What Is Needed To Rebuild The Pipeline When It Has To Be Resumed
+    MODERATION_DB.update_one(
+        {"_id": ObjectId(upload_info.saved_id)},
+        {"$set": {"pipeline.upload_info": upload_info.__dict__}},
+    )
+    return list(jobs.values())
+
+
+# Enqueue The Stages That Have Not Completed Again, Each One Resuming From Its Last Checkpoint
+def resume_pipeline(moderation_id: str) -> List[Job]:
+    document = MODERATION_DB.find_one({"_id": ObjectId(moderation_id)})
+    if document is None:
+        raise ApplicationException("Moderasi Tidak Ditemukan", HTTPStatus.NOT_FOUND)
+
+    moderation = Moderation.from_document(document)
+    pipeline = moderation.pipeline or {}
+    requested_stages = [stage for stage in PIPELINE_STAGES if stage in pipeline]
+    pending_stages = [
+        stage
+        for stage in requested_stages
+        if pipeline[stage].get("status") != str(PipelineStatus.DONE)
+    ]
+    # The Keyframes Kept In The Frame Store Are Uploaded By A Job Of Their Own Once The Extraction Is Done,
+    # Which Is Enqueued Again When It Failed Or Is Gone
+    extraction = pipeline.get("extraction") or {}
+    resume_frame_upload = (
+        extraction.get("status") == str(PipelineStatus.DONE)
+        and extraction.get("frame_store", False)
+        and "upload_frames" not in extraction.get("steps", [])
+        and not is_job_pending(extraction.get("upload_frames_job_id"))
+    )
+    if len(pending_stages) == 0 and not resume_frame_upload:
+        raise ApplicationException(
+            "Tidak Ada Tahap Moderasi yang Perlu Dilanjutkan", HTTPStatus.BAD_REQUEST
+        )
+
+    # Cancel The Jobs Still Waiting On The Failed Stage, A Running Stage Can Not Be Resumed
+    for stage in pending_stages:
+        job_id = pipeline[stage].get("job_id")
+        if job_id is None:
+            continue
+        try:
+            job = Job.fetch(job_id, connection=conn)
+        except NoSuchJobError:
+            continue
+        if job.get_status() == JobStatus.STARTED:
+            raise ApplicationException("Moderasi Sedang Diproses", HTTPStatus.CONFLICT)
+        if job.get_status() in (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED):
+            job.cancel()
+
+    upload_info = UploadInfo(**pipeline["upload_info"])
+    metadata = [{"duration": moderation.duration}]
+    # The Conversion Stage May Have Moved The Video, Continue From Its Latest Files
+    if "convert" in pipeline.get("conversion", {}).get("steps", []):
+        upload_info = UploadInfo(**pipeline["conversion"]["upload_info"])
+    upload_info.saved_id = moderation_id
+
+    # Enqueue The Keyframe Upload First, So A Resumed Moderation Waits For It Instead Of Its Previous Error
+    jobs = []
+    if resume_frame_upload:
+        jobs.append(enqueue_frame_upload(upload_info, document.get("frames") or []))
+    if len(pending_stages) > 0:
+        jobs += enqueue_pipeline(upload_info, metadata, pending_stages)
+    return jobs
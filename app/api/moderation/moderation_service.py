@@ -9,11 +9,14 @@ import pdfkit
 import pytz
 from babel.dates import format_datetime
 from bson.objectid import ObjectId
-from rq import Queue
 
 from app.api.common.query_utils import clean_query_params, parse_query_params
+from app.api.common.gcloud_utils import MEDIA_CACHE
+from app.api.common.queue_utils import get_queue_metrics
+from app.api.common.workspace_utils import FRAME_STORE, JOB_WORKSPACES
 from app.api.exceptions import ApplicationException
-from app.api.moderation.moderation_job import generate_html_tags, moderate_video
+from app.api.moderation.moderation_job import generate_html_tags
+from app.api.moderation.moderation_pipeline import enqueue_pipeline
 from app.dto import (
     CreateModerationRequest,
     Metadata,
@@ -25,11 +28,17 @@ from app.dto import (
     UploadInfo,
 )
 from config import DATABASE, GOOGLE_BUCKET_NAME, GOOGLE_STORAGE_CLIENT, UPLOAD_PATH
-from redis_worker import conn
+from redis_worker import (
+    audio_queue,
+    conn,
+    conversion_queue,
+    extraction_queue,
+    inference_queue,
+    moderation_queue,
+)
 
 # Initializations
 logger = logging.getLogger(__name__)
-redis_conn = Queue(connection=conn)
 MODERATION_DB = DATABASE["moderation"]
 STATION_DB = DATABASE["stations"]
 
@@ -121,9 +130,7 @@ def start_moderation(object_id: str):
     video_metadata = [{"duration": moderation.duration}]
 
     # Enqueue A Job To Moderate The Video Using The Provided UploadInfo And Video Metadata
-    job = redis_conn.enqueue_call(
-        func=moderate_video, args=(upload_info, video_metadata), timeout=7200
-    )
+    job = enqueue_pipeline(upload_info, video_metadata, ["moderation"])[0]
 
     # Log The ID Of The Job And The Saved ID Of The UploadInfo Object For Debugging Purposes
     logger.info("Job %s queued || Moderating Video %s", job.id, upload_info.saved_id)
@@ -249,3 +256,20 @@ def validate_moderation(moderation_id, result_index, decision):
     MODERATION_DB.update_one({"_id": ObjectId(moderation_id)}, {"$set": update_data})
 
     return True
+
+
+# Returns The Depth And Wait Time Of Every Pipeline Stage Queue
+def get_queue_statistics() -> List[Dict[str, object]]:
+    return get_queue_metrics(
+        [conversion_queue, extraction_queue, audio_queue, moderation_queue, inference_queue], conn
+    )
+
+
+# Returns The Hit And Miss Counters And The Size Of The Local Media Cache
+def get_media_cache_statistics() -> Dict[str, int]:
+    return MEDIA_CACHE.get_stats()
+
+
+# Returns The Number And Disk Usage Of The Job Workspaces On This Host
+def get_workspace_statistics() -> Dict[str, int]:
+    return {**JOB_WORKSPACES.get_usage(), "frame_store": FRAME_STORE.get_usage()}
@@ -1,2 +1,3 @@
 from .moderation_decision import *
 from .moderation_status import *
+from .pipeline_status import *
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class PipelineStatus(Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+    def __str__(self):
+        return self.value
@@ -29,6 +29,7 @@ class Moderation:
     updated_at: datetime = field(default=None)
     result: List[ModerationResult] = field(default=None)
     frames: List[FrameResult] = field(default=None)
+    pipeline: dict = field(default=None)
 
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
@@ -0,0 +1,59 @@
+"""Compare transcribing a long recording as one piece with the chunked, concurrent transcription.
+
+The recognizer is a StubRecognizer that sleeps `LATENCY` seconds per second of audio, over a
+synthetic transcript with blacklisted words. The chunked run includes cutting the chunks. Both runs must report the same violations; the
+chunked one also reports when its first violation arrived.
+
+Usage: python -m benchmarks.chunked_transcription [minutes]
+"""
+import random
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.speech import AudioChunk, RecognizedWord, StubRecognizer, iter_audio_violations, split_audio
+from ai_utils.text import FileLexiconSource, Lexicon
+
+LATENCY = 0.01
+WORDS = [f"kata{idx}" for idx in range(200)] + ["anjing", "anak", "haram"]
+
+
+def synthetic_transcript(duration, seed=0):
+    rng = random.Random(seed)
+    words, position = [], 0.0
+    while position < duration - 1:
+        length = rng.uniform(0.2, 0.6)
+        words.append(RecognizedWord(rng.choice(WORDS), position, position + length))
+        position += length + rng.uniform(0.0, 0.2)
+    return words
+
+
+if __name__ == "__main__":
+    duration = int(sys.argv[1]) * 60 if len(sys.argv) > 1 else 35 * 60
+    with TemporaryDirectory() as temp_dir:
+        audio_path = f"{temp_dir}/audio.mp3"
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=duration={duration}", "-ac", "1", audio_path],
+            check=True,
+        )
+        with open(f"{temp_dir}/abusive.csv", "w") as csv_file:
+            csv_file.write("ABUSIVE\nanjing\nanak haram\n")
+        lexicon = Lexicon(FileLexiconSource(f"{temp_dir}/abusive.csv"))
+        recognizer = StubRecognizer(synthetic_transcript(duration), latency=LATENCY)
+
+        start_time = time.time()
+        whole = list(iter_audio_violations([AudioChunk(0, audio_path, 0.0, float(duration))], recognizer, lexicon))
+        print(f"single piece | {time.time() - start_time:6.2f} s | {len(whole)} violations")
+
+        start_time = time.time()
+        chunks = split_audio(audio_path, temp_dir)
+        chunked, first_seconds = [], None
+        for violation in iter_audio_violations(chunks, recognizer, lexicon):
+            first_seconds = first_seconds or time.time() - start_time
+            chunked.append(violation)
+        print(
+            f"chunked      | {time.time() - start_time:6.2f} s | {len(chunked)} violations | "
+            f"{len(chunks)} chunks, first violation after {first_seconds:.2f} s"
+        )
+        print(f"same violations: {chunked == whole}")
@@ -0,0 +1,66 @@
+"""Compare cutting 1, 10 and 100 violation clips out of one video.
+
+- per-clip: one ffmpeg process per clip, with the command moviepy's ffmpeg_extract_subclip runs
+  (the old path)
+- single-run: cut_clips, all clips of a batch as seeking inputs of one ffmpeg process, stream
+  copied from the keyframe when it is close enough to the clip start
+
+Both keyframe intervals are measured: 1 second, where every clip is stream copied, and 10
+seconds, where most clips are re-encoded to start on time. The per-clip copy always starts on the
+keyframe before the clip, so its worst start error is printed next to its time.
+
+Usage: python -m benchmarks.clip_cutting [duration]
+"""
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.extract.video_clips import MAX_KEYFRAME_DRIFT, clip_windows, cut_clips, keyframe_times, merge_windows
+from benchmarks.synthetic_video import write_synthetic_video
+
+CLIP_COUNTS = [1, 10, 100]
+GOPS = [25, 250]
+
+
+def per_clip_cut(video_path, windows, output_pattern):
+    for idx, (start, end) in enumerate(windows):
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error", "-ss", str(start), "-i", str(video_path),
+                "-t", str(end - start), "-map", "0", "-vcodec", "copy", "-acodec", "copy",
+                output_pattern.format(idx),
+            ],
+            check=True,
+        )
+
+
+def single_run_cut(video_path, windows, output_pattern):
+    clips, _ = merge_windows(windows)
+    results = cut_clips(video_path, clips, [output_pattern.format(idx) for idx in range(len(clips))])
+    return sum(clip["mode"] == "copy" for clip in results), len(clips)
+
+
+if __name__ == "__main__":
+    duration = int(sys.argv[1]) if len(sys.argv) > 1 else 900
+    with TemporaryDirectory() as temp_dir:
+        for gop in GOPS:
+            video_path = write_synthetic_video(f"{temp_dir}/synthetic_{gop}.mp4", duration=duration, gop=gop)
+            for count in CLIP_COUNTS:
+                seconds = [duration * (idx + 1) / (count + 1) for idx in range(count)]
+                windows = clip_windows(seconds, duration)
+
+                start_time = time.time()
+                per_clip_cut(video_path, windows, f"{temp_dir}/per_clip_{{}}.mp4")
+                per_clip_seconds = time.time() - start_time
+                keyframes = keyframe_times(video_path, [start for start, _ in windows])
+                per_clip_error = max(start - keyframe for (start, _), keyframe in zip(windows, keyframes))
+
+                start_time = time.time()
+                copied, clips = single_run_cut(video_path, windows, f"{temp_dir}/single_run_{{}}.mp4")
+                single_run_seconds = time.time() - start_time
+
+                print(
+                    f"gop {gop:>3} | {count:>3} clips | per-clip {per_clip_seconds:6.2f} s, start error <= {per_clip_error:4.1f} s | "
+                    f"single-run {single_run_seconds:6.2f} s, start error <= {MAX_KEYFRAME_DRIFT:4.1f} s ({clips} clips, {copied} copied)"
+                )
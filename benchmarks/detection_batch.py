@@ -0,0 +1,30 @@
+"""Compare ObjectDetector throughput at batch sizes 1, 8 and 32.
+
+Requires the saved models under ai_utils/saved_model (see the Dockerfile).
+
+Usage: python -m benchmarks.detection_batch [category]
+"""
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from ai_utils.detect import ObjectDetector
+
+if __name__ == "__main__":
+    category = sys.argv[1] if len(sys.argv) > 1 else "saru"
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, size=(720, 1280, 3), dtype=np.uint8))
+        for _ in range(64)
+    ]
+
+    client = ObjectDetector(category)
+    client.detect_batch(images[:1], 1)  # warm up the graph
+
+    for batch_size in [1, 8, 32]:
+        start_time = time.time()
+        client.detect_batch(images, batch_size)
+        elapsed = time.time() - start_time
+        print(f"{category} | batch_size={batch_size:<2} | {len(images) / elapsed:6.2f} frames/s")
@@ -0,0 +1,66 @@
+import shutil
+import time
+
+from ai_utils.storage import DELETE_BATCH_SIZE, LocalBackend
+
+
+class NullBlob(object):
+    """Blob stand-in that accepts uploads and discards them after an optional simulated latency."""
+
+    def __init__(self, name, latency=0.0):
+        self.name = name
+        self.latency = latency
+
+    def upload_from_filename(self, filename, content_type=None):
+        time.sleep(self.latency)
+
+    def upload_from_string(self, data, content_type=None):
+        time.sleep(self.latency)
+
+    def make_public(self):
+        time.sleep(self.latency)
+
+
+class NullBucket(object):
+    """Bucket stand-in so extraction can be benchmarked without Google Cloud Storage.
+
+    `latency` is the simulated round-trip time, in seconds, of every blob request.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def blob(self, name):
+        return NullBlob(name, self.latency)
+
+
+class LocalSource(object):
+    """Source blob stand-in that "downloads" a local video file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = str(path)
+
+    def download_to_filename(self, filename):
+        shutil.copyfile(self.path, filename)
+
+
+class SlowLocalBackend(LocalBackend):
+    """Local storage backend that sleeps for a simulated round-trip on every request."""
+
+    def __init__(self, root, latency=0.0):
+        super().__init__(root)
+        self.latency = latency
+
+    def upload(self, remote_dest, local_source, public=False):
+        time.sleep(self.latency * (2 if public else 1))
+        super().upload(remote_dest, local_source, public)
+
+    def download(self, remote_source, local_dest):
+        time.sleep(self.latency)
+        super().download(remote_source, local_dest)
+
+    def delete(self, remote_names):
+        # One batch request per DELETE_BATCH_SIZE blobs, like the GCS backend
+        time.sleep(self.latency * -(-len(remote_names) // DELETE_BATCH_SIZE))
+        super().delete(remote_names)
@@ -0,0 +1,50 @@
+"""Compare handing keyframes from extraction to detection through JPEG files and through the frame store.
+
+- jpeg: encode to JPEG, write, read back with PIL and convert to an RGB array (the bucket
+  upload and download of the old path are left out, they only add latency)
+- frame store: save the RGB array and read it back memory-mapped
+
+The mean absolute pixel difference shows what the JPEG round-trip loses.
+
+Usage: python -m benchmarks.frame_handoff [count]
+"""
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ai_utils.storage import FrameStore
+from benchmarks.synthetic_video import write_synthetic_video
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with TemporaryDirectory() as temp_dir:
+        video_path = write_synthetic_video(f"{temp_dir}/synthetic.mp4", duration=count // 25 + 1, width=1280, height=720)
+        cap = cv2.VideoCapture(video_path)
+        frames = [cap.read()[1] for _ in range(count)]
+        cap.release()
+        names = [f"frames/frame_{idx}.jpg" for idx in range(count)]
+
+        start_time = time.time()
+        jpeg_frames = []
+        for name, frame in zip(names, frames):
+            path = f"{temp_dir}/{name.split('/')[-1]}"
+            cv2.imwrite(path, frame)
+            with Image.open(path) as image:
+                jpeg_frames.append(np.asarray(image.convert("RGB"), dtype=np.uint8))
+        jpeg_seconds = time.time() - start_time
+
+        store = FrameStore(f"{temp_dir}/store", 3600)
+        start_time = time.time()
+        for name, frame in zip(names, frames):
+            store.put("moderation", name, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        store_frames = [np.ascontiguousarray(store.get("moderation", name)) for name in names]
+        store_seconds = time.time() - start_time
+
+        expected = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).astype(np.int16) for frame in frames]
+        for name, seconds, handed in [("jpeg", jpeg_seconds, jpeg_frames), ("frame store", store_seconds, store_frames)]:
+            error = np.mean([np.abs(frame - original).mean() for frame, original in zip(handed, expected)])
+            print(f"{name:<11} | {count} frames | {seconds:6.2f} s | mean pixel error {error:.2f}")
@@ -0,0 +1,39 @@
+"""Compare the per-frame cv2.subtract/countNonZero loop with the batched NumPy scorer.
+
+Runs on random blurred frames, no video files needed.
+
+Usage: python -m benchmarks.frame_scoring
+"""
+import time
+
+import cv2
+import numpy as np
+
+from ai_utils.extract.frame_scoring import diff_magnitudes
+
+
+def per_frame_magnitudes(frames):
+    magnitudes = []
+    last_frame = frames[0]
+    for frame in frames:
+        magnitudes.append(cv2.countNonZero(cv2.subtract(frame, last_frame)))
+        last_frame = frame
+    return magnitudes
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    for height, width in [(180, 320), (360, 640), (1080, 1920)]:
+        count = 300 if height < 1080 else 60
+        frames = rng.integers(0, 256, size=(count, height, width), dtype=np.uint8)
+        frames = np.stack([cv2.GaussianBlur(frame, (9, 9), 0.0) for frame in frames])
+
+        start_time = time.time()
+        expected = per_frame_magnitudes(frames)
+        print(f"{width}x{height} | per-frame loop      | {count / (time.time() - start_time):9.1f} frames/s")
+        for chunk_size in [None, 4, 16, 64]:
+            start_time = time.time()
+            magnitudes = diff_magnitudes(frames, chunk_size=chunk_size)
+            elapsed = time.time() - start_time
+            assert magnitudes.tolist() == expected
+            print(f"{width}x{height} | batched chunk={str(chunk_size):<4} | {count / elapsed:9.1f} frames/s")
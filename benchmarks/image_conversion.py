@@ -0,0 +1,27 @@
+"""Measure the cost of turning a decoded PIL image into the model's uint8 input array, per resolution.
+
+Usage: python -m benchmarks.image_conversion
+"""
+import time
+
+import numpy as np
+from PIL import Image
+
+from ai_utils.detect import image_to_array
+
+
+def getdata_to_array(image):
+    (im_width, im_height) = image.size
+    return np.array(image.getdata()).reshape((im_height, im_width, 3)).astype(np.uint8)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    for width, height in [(640, 360), (1280, 720), (1920, 1080)]:
+        image = Image.fromarray(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8))
+        for name, convert, repeat in [("getdata", getdata_to_array, 3), ("image_to_array", image_to_array, 100)]:
+            start_time = time.time()
+            for _ in range(repeat):
+                array = convert(image)
+            elapsed = (time.time() - start_time) / repeat
+            print(f"{width}x{height} | {name:<14} | {elapsed * 1000:8.2f} ms/frame")
@@ -0,0 +1,30 @@
+"""Compare CPU time of keyframe_detection per frame source on a broadcast-like 1080p video.
+
+CPU time includes the ffmpeg child processes.
+
+Usage: python -m benchmarks.keyframe_frame_source
+"""
+import os
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.extract import FRAME_SOURCES, keyframe_detection
+from benchmarks.fakes import LocalSource, NullBucket
+from benchmarks.synthetic_video import write_synthetic_video
+
+
+def cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+if __name__ == "__main__":
+    with TemporaryDirectory() as temp_dir:
+        video_path = write_synthetic_video(f"{temp_dir}/synthetic.mp4", duration=120, width=1920, height=1080, preset="veryfast")
+        for frame_source in FRAME_SOURCES:
+            start_time, start_cpu = time.time(), cpu_time()
+            results = keyframe_detection("benchmark", "synthetic.mp4", LocalSource(video_path), NullBucket(), 0.4, frame_source=frame_source)
+            print(
+                f"{frame_source:<17} | {time.time() - start_time:7.2f} s wall | {cpu_time() - start_cpu:7.2f} s CPU | "
+                f"{len(results)} keyframes at {[result['frame_time'] for result in results]}"
+            )
@@ -0,0 +1,50 @@
+"""Measure peak RSS of keyframe_detection with and without streaming mode.
+
+Every run happens in a fresh process so the allocator high-water mark of one run
+does not leak into the next one.
+
+Usage: python -m benchmarks.keyframe_memory
+"""
+import threading
+import time
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+
+import psutil
+
+from ai_utils.extract import keyframe_detection
+from benchmarks.fakes import LocalSource, NullBucket
+from benchmarks.synthetic_video import write_synthetic_video
+
+
+def measure_peak_memory(video_path, streaming):
+    process = psutil.Process()
+    initial_memory = process.memory_info().rss / (1024 * 1024)
+    peak_memory = initial_memory
+    running = True
+
+    def sample_memory():
+        nonlocal peak_memory
+        while running:
+            peak_memory = max(peak_memory, process.memory_info().rss / (1024 * 1024))
+            time.sleep(0.01)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    start_time = time.time()
+    keyframe_detection("benchmark", "synthetic.mp4", LocalSource(video_path), NullBucket(), 0.4, streaming=streaming)
+    elapsed = time.time() - start_time
+    running = False
+    sampler.join()
+    return peak_memory - initial_memory, elapsed
+
+
+if __name__ == "__main__":
+    context = get_context("spawn")
+    with TemporaryDirectory() as temp_dir:
+        for duration in [60, 300, 900]:
+            video_path = write_synthetic_video(f"{temp_dir}/synthetic_{duration}.mp4", duration=duration, width=1280, height=720)
+            for streaming in [False, True]:
+                with context.Pool(1) as pool:
+                    peak_memory, elapsed = pool.apply(measure_peak_memory, (video_path, streaming))
+                print(f"{duration:>4}s video | streaming={str(streaming):<5} | {elapsed:7.2f} s | peak +{peak_memory:8.1f} MB")
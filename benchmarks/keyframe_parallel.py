@@ -0,0 +1,38 @@
+"""Compare serial and segment-parallel keyframe scoring and check they produce the same series.
+
+Usage: python -m benchmarks.keyframe_parallel
+"""
+import os
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.extract.frame_sampler import open_video, sample_frames
+from ai_utils.extract.frame_scoring import blur_frame, score_frames
+from ai_utils.extract.parallel_extract import parallel_score_frames
+from benchmarks.synthetic_video import write_synthetic_video
+
+
+def serial_score_frames(video_path):
+    cap, length, fps = open_video(video_path)
+    blurred_frames = ((second, blur_frame(frame)) for second, frame in sample_frames(cap, fps, length))
+    result = score_frames(blurred_frames)
+    cap.release()
+    return result
+
+
+if __name__ == "__main__":
+    with TemporaryDirectory() as temp_dir:
+        video_path = write_synthetic_video(f"{temp_dir}/synthetic.mp4", duration=600, width=1280, height=720)
+        _, length, fps = open_video(video_path)
+
+        start_time = time.time()
+        expected = serial_score_frames(video_path)
+        serial_time = time.time() - start_time
+        print(f"serial     | {serial_time:7.2f} s")
+
+        for workers in sorted({2, 4, 8, os.cpu_count()}):
+            start_time = time.time()
+            result = parallel_score_frames(video_path, length, fps, workers)
+            elapsed = time.time() - start_time
+            assert result == expected
+            print(f"workers={workers:<2} | {elapsed:7.2f} s | speedup {serial_time / elapsed:5.2f}x")
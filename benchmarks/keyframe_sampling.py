@@ -0,0 +1,30 @@
+"""Compare the seeking and the sequential keyframe samplers on synthetic videos.
+
+Usage: python -m benchmarks.keyframe_sampling
+"""
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.extract.frame_sampler import SAMPLERS, open_video, sample_frames
+from benchmarks.synthetic_video import write_synthetic_video
+
+
+def run_sampler(video_path, sampler):
+    cap, length, fps = open_video(video_path)
+    start_time = time.time()
+    sampled = sum(1 for _ in sample_frames(cap, fps, length, sampler))
+    elapsed = time.time() - start_time
+    cap.release()
+    return length, sampled, elapsed
+
+
+if __name__ == "__main__":
+    with TemporaryDirectory() as temp_dir:
+        for duration in [30, 120, 300]:
+            video_path = write_synthetic_video(f"{temp_dir}/synthetic_{duration}.mp4", duration=duration)
+            for sampler in SAMPLERS:
+                length, sampled, elapsed = run_sampler(video_path, sampler)
+                print(
+                    f"{duration:>4}s video | {sampler:<10} | {elapsed:7.2f} s | "
+                    f"{length / elapsed:8.1f} source frames/s | {sampled / elapsed:7.1f} sampled frames/s"
+                )
@@ -0,0 +1,43 @@
+"""Compare the serial imwrite/upload_from_filename/make_public loop with the concurrent upload pipeline.
+
+Uploads go to a fake bucket that sleeps for a simulated round-trip on every request.
+
+Usage: python -m benchmarks.keyframe_upload
+"""
+import time
+from tempfile import NamedTemporaryFile
+
+import cv2
+import numpy as np
+
+from ai_utils.extract.keyframe_upload import upload_keyframes
+from benchmarks.fakes import NullBucket
+
+LATENCY = 0.05
+
+
+def serial_upload(dest, keyframes):
+    for keyframe_path, _, frame in keyframes:
+        with NamedTemporaryFile(suffix='.jpg') as temp:
+            cv2.imwrite(temp.name, frame)
+            dest_blob = dest.blob(keyframe_path)
+            dest_blob.upload_from_filename(temp.name, content_type='image/jpeg')
+            dest_blob.make_public()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    count = 100
+    frame = cv2.resize(rng.integers(0, 256, size=(135, 240, 3), dtype=np.uint8), (1920, 1080))
+    keyframes = [(f"frames/keyframe_{index}.jpg", index, frame) for index in range(count)]
+    dest = NullBucket(latency=LATENCY)
+
+    start_time = time.time()
+    serial_upload(dest, keyframes)
+    elapsed = time.time() - start_time
+    print(f"serial     | {count / elapsed:7.1f} keyframes/s")
+    for workers in [1, 4, 8, 16]:
+        start_time = time.time()
+        upload_keyframes(dest, keyframes, workers)
+        elapsed = time.time() - start_time
+        print(f"workers={workers:<2} | {count / elapsed:7.1f} keyframes/s")
@@ -0,0 +1,80 @@
+"""Compare the old list matcher of transcribe_gcs with Lexicon.match on a 10k-word transcript.
+
+- list: `word in blacklisted_words_list` on the list get_blacklisted_words used to build (every
+  entry twice, as written and lowercased), a linear scan per word
+- lexicon: Lexicon.match against the normalized frozenset, loaded once from a local CSV
+
+Lexicons of 125 entries (the size of abusive.csv) and 5000 entries are measured. The phrase
+column runs Lexicon.match on lexicons where a fifth of the entries are two or three word phrases,
+up to 50000 entries, to show the matching time does not grow with the lexicon.
+
+Usage: python -m benchmarks.lexicon_matching [words]
+"""
+import random
+import string
+import sys
+import time
+from tempfile import NamedTemporaryFile
+
+from ai_utils.text import FileLexiconSource, Lexicon
+
+LEXICON_SIZES = [125, 5000]
+PHRASE_LEXICON_SIZES = [125, 5000, 50000]
+
+
+def random_word(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(0)
+    vocabulary = [random_word(rng) for _ in range(2000)]
+    for size in LEXICON_SIZES:
+        entries = [f"{random_word(rng)}x" for _ in range(size)]
+        # About one word in a hundred is blacklisted
+        transcript = [rng.choice(entries) if rng.random() < 0.01 else rng.choice(vocabulary) for _ in range(count)]
+
+        with NamedTemporaryFile("w", suffix=".csv") as csv_file:
+            csv_file.write("ABUSIVE\n" + "\n".join(entries) + "\n")
+            csv_file.flush()
+
+            blacklisted_words_list = entries + [entry.lower() for entry in entries]
+            start_time = time.time()
+            list_matches = [index for index, word in enumerate(transcript) if word in blacklisted_words_list]
+            list_seconds = time.time() - start_time
+
+            lexicon = Lexicon(FileLexiconSource(csv_file.name))
+            lexicon.words()
+            start_time = time.time()
+            lexicon_matches = [start for start, _, _ in lexicon.match(transcript)]
+            lexicon_seconds = time.time() - start_time
+
+        assert list_matches == lexicon_matches
+        print(
+            f"{size:>5} entries | {count} words | list {list_seconds * 1000:8.2f} ms | "
+            f"lexicon {lexicon_seconds * 1000:6.2f} ms | {len(lexicon_matches)} matches"
+        )
+
+    for size in PHRASE_LEXICON_SIZES:
+        entries = [
+            " ".join(f"{random_word(rng)}x" for _ in range(rng.randint(2, 3))) if rng.random() < 0.2 else f"{random_word(rng)}x"
+            for _ in range(size)
+        ]
+        transcript = []
+        while len(transcript) < count:
+            transcript += rng.choice(entries).split() if rng.random() < 0.01 else [rng.choice(vocabulary)]
+
+        with NamedTemporaryFile("w", suffix=".csv") as csv_file:
+            csv_file.write("ABUSIVE\n" + "\n".join(entries) + "\n")
+            csv_file.flush()
+            lexicon = Lexicon(FileLexiconSource(csv_file.name))
+            lexicon.words()
+            start_time = time.time()
+            matches = lexicon.match(transcript)
+            phrase_seconds = time.time() - start_time
+
+        print(
+            f"{size:>5} entries | {len(transcript)} words | phrase lexicon {phrase_seconds * 1000:6.2f} ms | "
+            f"{len(matches)} matches, {sum(' ' in phrase for _, _, phrase in matches)} phrases"
+        )
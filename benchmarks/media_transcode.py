@@ -0,0 +1,80 @@
+"""Compare the upload conversion paths on mkv, avi and mov sources with an audio track.
+
+- moviepy: VideoFileClip.write_videofile to H.264 followed by ffmpeg_extract_audio (the old path,
+  skipped when moviepy is not installed)
+- two-pass: the same two decodes done by ffmpeg alone, without moviepy's Python frame loop
+- single-pass: transcode_video_extract_audio, remuxing compatible streams
+
+Usage: python -m benchmarks.media_transcode [duration]
+"""
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.extract.media_transcode import transcode_video_extract_audio
+from benchmarks.synthetic_video import write_synthetic_video
+
+# Container with the (video, audio) codecs a recorder would typically put in it
+CONTAINERS = {
+    "mkv": ("libx264", "aac"),
+    "avi": ("mpeg4", "libmp3lame"),
+    "mov": ("libx264", "pcm_s16le"),
+}
+
+
+def write_sample(video_path, sample_path, video_codec, audio_codec, duration):
+    """Mux the video with a sine tone into the sample container using the given codecs."""
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error", "-i", str(video_path),
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+            "-map", "0:v", "-map", "1:a", "-c:v", video_codec, "-c:a", audio_codec, "-shortest",
+            str(sample_path),
+        ],
+        check=True,
+    )
+
+
+def moviepy_convert(source_path, mp3_path, mp4_path):
+    from moviepy.editor import VideoFileClip
+    from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_audio
+
+    video_clip = VideoFileClip(str(source_path))
+    video_clip.write_videofile(str(mp4_path), codec="libx264", logger=None)
+    video_clip.close()
+    ffmpeg_extract_audio(str(mp4_path), str(mp3_path))
+
+
+def two_pass_convert(source_path, mp3_path, mp4_path):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", str(source_path), "-c:v", "libx264", "-c:a", "aac", str(mp4_path)],
+        check=True,
+    )
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", str(mp4_path), "-vn", "-ar", "44100", str(mp3_path)],
+        check=True,
+    )
+
+
+def single_pass_convert(source_path, mp3_path, mp4_path):
+    conversion = transcode_video_extract_audio(source_path, mp3_path, mp4_path)
+    return f"video {conversion['video_output']}, audio {conversion['audio_output']}"
+
+
+if __name__ == "__main__":
+    duration = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    with TemporaryDirectory() as temp_dir:
+        video_path = write_synthetic_video(f"{temp_dir}/synthetic.mp4", duration=duration, width=1280, height=720)
+        for container, (video_codec, audio_codec) in CONTAINERS.items():
+            sample_path = f"{temp_dir}/sample.{container}"
+            write_sample(video_path, sample_path, video_codec, audio_codec, duration)
+
+            for name, convert in [("moviepy", moviepy_convert), ("two-pass", two_pass_convert), ("single-pass", single_pass_convert)]:
+                start_time = time.time()
+                try:
+                    mode = convert(sample_path, f"{temp_dir}/out.mp3", f"{temp_dir}/out.mp4") or "transcode"
+                except ImportError:
+                    print(f"{container} | {name:<11} | skipped, moviepy is not installed")
+                    continue
+                print(f"{container} | {name:<11} | {time.time() - start_time:7.2f} s | {mode}")
@@ -0,0 +1,45 @@
+"""Measure the offline Vosk recognizer when its model is loaded for every job and when it is kept across jobs.
+
+Every job transcribes the same recording, given as an mp3 or any file ffmpeg reads, in chunks
+and matches the transcript against a small lexicon. The first run loads a new VoskRecognizer per
+job, as a forking worker would; the second shares one recognizer, as the moderation workers do
+through get_recognizer. vosk and a model matching the language of the recording are required.
+
+Usage: python -m benchmarks.offline_recognizer <model_path> <audio_path> [jobs]
+"""
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.speech import VoskRecognizer, iter_audio_violations, split_audio
+from ai_utils.text import FileLexiconSource, Lexicon
+
+
+def run_job(recognizer, audio_path, lexicon):
+    with TemporaryDirectory() as temp_dir:
+        return list(iter_audio_violations(split_audio(audio_path, temp_dir), recognizer, lexicon))
+
+
+if __name__ == "__main__":
+    model_path, audio_path = sys.argv[1], sys.argv[2]
+    jobs = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    with TemporaryDirectory() as temp_dir:
+        with open(f"{temp_dir}/abusive.csv", "w") as csv_file:
+            csv_file.write("ABUSIVE\nanjing\nanak haram\nthe\n")
+        lexicon = Lexicon(FileLexiconSource(f"{temp_dir}/abusive.csv"))
+
+        start_time = time.time()
+        for _ in range(jobs):
+            violations = run_job(VoskRecognizer(model_path), audio_path, lexicon)
+        print(f"model per job | {jobs} jobs | {time.time() - start_time:6.2f} s | {len(violations)} violations")
+
+        recognizer = VoskRecognizer(model_path)
+        start_time = time.time()
+        recognizer.load()
+        load_seconds = time.time() - start_time
+        for _ in range(jobs):
+            violations = run_job(recognizer, audio_path, lexicon)
+        print(
+            f"shared model  | {jobs} jobs | {time.time() - start_time:6.2f} s | {len(violations)} violations | "
+            f"model loaded once in {load_seconds:.2f} s"
+        )
@@ -0,0 +1,61 @@
+"""Compare serial and concurrent transfers of keyframe-sized files.
+
+- serial: one request after another, like the old download_files_gcloud loop and one delete
+  request per blob
+- transfer manager: download_many/upload_many on the worker pool and batched deletes
+
+The storage is a local directory that sleeps for a simulated round-trip on every request.
+
+Usage: python -m benchmarks.storage_transfer [count]
+"""
+import os
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from ai_utils.storage import TransferManager
+from benchmarks.fakes import SlowLocalBackend
+
+LATENCY = 0.05
+FILE_SIZE = 64 * 1024
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with TemporaryDirectory() as temp_dir:
+        backend = SlowLocalBackend(f"{temp_dir}/storage", latency=LATENCY)
+        manager = TransferManager(backend)
+        local_paths = []
+        for idx in range(count):
+            local_paths.append(f"{temp_dir}/frame_{idx}.jpg")
+            with open(local_paths[-1], "wb") as file:
+                file.write(os.urandom(FILE_SIZE))
+        names = [f"frames/frame_{idx}.jpg" for idx in range(count)]
+
+        start_time = time.time()
+        for name, path in zip(names, local_paths):
+            backend.upload(name, path, public=True)
+        print(f"upload   | serial           | {time.time() - start_time:6.2f} s")
+        start_time = time.time()
+        manager.upload_many(zip(names, local_paths), public=True)
+        print(f"upload   | transfer manager | {time.time() - start_time:6.2f} s")
+
+        for name in ["serial", "transfer manager"]:
+            dest = f"{temp_dir}/{name.replace(' ', '_')}"
+            os.makedirs(dest)
+            start_time = time.time()
+            if name == "serial":
+                for remote in names:
+                    backend.download(remote, f"{dest}/{remote.split('/')[-1]}")
+            else:
+                manager.download_many(dest, names)
+            print(f"download | {name:<16} | {time.time() - start_time:6.2f} s")
+
+        start_time = time.time()
+        for remote in names:
+            backend.delete([remote])
+        print(f"delete   | serial           | {time.time() - start_time:6.2f} s")
+        manager.upload_many(zip(names, local_paths))
+        start_time = time.time()
+        manager.delete_many(names)
+        print(f"delete   | transfer manager | {time.time() - start_time:6.2f} s")
@@ -0,0 +1,32 @@
+import subprocess
+
+import cv2
+import numpy as np
+
+
+def write_synthetic_video(path, duration=60, fps=25, width=640, height=360, scene_length=4, gop=250, preset="ultrafast", seed=0):
+    """Write an H.264 mp4 with a hard scene cut every `scene_length` seconds and motion in between.
+
+    The keyframe interval (`gop`) defaults to 10 seconds at 25 fps, which is what broadcast recordings use.
+    Presets slower than "ultrafast" add B-frames and scene-cut keyframes like a broadcast encoder.
+    """
+    rng = np.random.default_rng(seed)
+    command = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        "-c:v", "libx264", "-preset", preset, "-g", str(gop), "-pix_fmt", "yuv420p",
+        str(path),
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    background = None
+    for frame_index in range(duration * fps):
+        if frame_index % (scene_length * fps) == 0:
+            background = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+            background = cv2.resize(background, (width, height), interpolation=cv2.INTER_NEAREST)
+        frame = background.copy()
+        offset = (frame_index * 4) % width
+        cv2.rectangle(frame, (offset, height // 3), (offset + width // 8, height // 2), (255, 255, 255), -1)
+        process.stdin.write(frame.tobytes())
+    process.stdin.close()
+    process.wait()
+    return path
@@ -15,6 +15,18 @@ GOOGLE_EXTRACT_FRAME_URL = str(os.getenv('GOOGLE_FUNCTION_EXTRACT_FRAME'))
 GOOGLE_MODERATE_AUDIO_URL = str(os.getenv('GOOGLE_FUNCTION_MODERATE_AUDIO'))
 
 USE_GOOGLE_FUNCTIONS = str(os.getenv('APPLICATION_USE_GOOGLE_FUNCTIONS')) == "True"
+USE_INFERENCE_WORKER = str(os.getenv('APPLICATION_USE_INFERENCE_WORKER')) == "True"
+USE_FRAME_STORE = str(os.getenv('APPLICATION_USE_FRAME_STORE')) == "True"
 SECRET_KEY = str(os.getenv('APPLICATION_SECRET_KEY'))
 UPLOAD_PATH = f"{os.getcwd()}/uploads"
+MEDIA_CACHE_PATH = str(os.getenv('MEDIA_CACHE_PATH', f"{UPLOAD_PATH}/cache"))
+MEDIA_CACHE_MAX_BYTES = int(float(os.getenv('MEDIA_CACHE_MAX_GB', '20')) * 1024 ** 3)
+WORKSPACE_MAX_AGE_HOURS = float(os.getenv('WORKSPACE_MAX_AGE_HOURS', '24'))
+FRAME_STORE_PATH = str(os.getenv('FRAME_STORE_PATH', f"{UPLOAD_PATH}/frame_store"))
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', '1'))
+STORAGE_BACKEND = str(os.getenv('STORAGE_BACKEND', 'gcs'))
+STORAGE_LOCAL_PATH = str(os.getenv('STORAGE_LOCAL_PATH', f"{UPLOAD_PATH}/storage"))
+STORAGE_TRANSFER_WORKERS = int(os.getenv('STORAGE_TRANSFER_WORKERS', '16'))
+AUDIO_RECOGNIZER = str(os.getenv('AUDIO_RECOGNIZER', 'function'))
+VOSK_MODEL_PATH = str(os.getenv('VOSK_MODEL_PATH', f"{os.getcwd()}/models/vosk"))
  
\ No newline at end of file
@@ -1,17 +1,120 @@
 import os
+import signal
+import subprocess
+import sys
 
 import redis
-from rq import Connection, Queue, Worker
+from rq import Connection, Queue, SimpleWorker, Worker
 
-listen = ['default']
+# Every pipeline stage has its own queue, so long moderation jobs never hold up the short
+# conversion jobs of other users. Jobs left on the old shared queue are drained by the last stage.
+conversion_queue = os.getenv('CONVERSION_QUEUE', 'conversion')
+extraction_queue = os.getenv('EXTRACTION_QUEUE', 'extraction')
+# The audio stage has a queue of its own, so the audio is moderated next to the frame detection of the
+# moderation stage instead of taking its worker.
+audio_queue = os.getenv('AUDIO_QUEUE', 'audio')
+moderation_queue = os.getenv('MODERATION_QUEUE', 'moderation')
+# Queue served by the inference workers, which own the detection models.
+inference_queue = os.getenv('INFERENCE_QUEUE', 'inference')
+legacy_queue = 'default'
+
+# Stages in priority order with the number of workers started for each, e.g. "conversion:2,extraction:1".
+# A worker takes jobs from its own stage first and from the higher priority stages when that is empty,
+# but never from the lower ones. Inference workers only serve the inference queue.
+worker_topology = os.getenv(
+    'WORKER_TOPOLOGY',
+    f'{conversion_queue}:1,{extraction_queue}:1,{audio_queue}:1,{moderation_queue}:1,{inference_queue}:0',
+)
 
 redis_host = os.getenv('REDIS_HOST', 'localhost')
 redis_port = os.getenv('REDIS_PORT', '6379')
 redis_password = os.getenv('REDIS_PASSWORD', '')
 
+# Load the detection models once at worker start and keep them for every job, in the workers that run the
+# detection: the inference workers, and the moderation workers unless they hand it to the inference workers.
+# Jobs then run in the worker process itself (no fork per job), so the models survive between jobs.
+preload_models = os.getenv('WORKER_PRELOAD_MODELS', 'False') == 'True'
+use_inference_worker = os.getenv('APPLICATION_USE_INFERENCE_WORKER') == 'True'
+
+# Audio moderation backend, the audio and moderation workers load the offline Vosk model once and keep it for every job.
+audio_recognizer = os.getenv('AUDIO_RECOGNIZER', 'function')
+vosk_model_path = os.getenv('VOSK_MODEL_PATH', f"{os.getcwd()}/models/vosk")
+
 conn = redis.from_url(f'redis://:{redis_password}@{redis_host}:{redis_port}')
 
-if __name__ == '__main__':
+
+def parse_topology(topology):
+    """Parse "queue:count,..." into a list of (queue, count) in priority order."""
+    stages = []
+    for item in topology.split(','):
+        if item.strip() == '':
+            continue
+        name, _, count = item.strip().partition(':')
+        stages.append((name, int(count or 1)))
+    return stages
+
+
+def topology_listen(stages):
+    """Return the queues of every worker in the topology, in the order each worker listens on them."""
+    workers = []
+    names = [name for name, _ in stages if name != inference_queue]
+    for name, count in stages:
+        if name == inference_queue:
+            queues = [name]
+        else:
+            queues = [name] + names[:names.index(name)]
+            if name == names[-1]:
+                queues.append(legacy_queue)
+        workers.extend([queues] * count)
+    return workers
+
+
+def launch_workers(topology):
+    """Start one worker process per worker in the topology and wait for all of them to exit."""
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), *queues])
+        for queues in topology_listen(parse_topology(topology))
+    ]
+
+    def stop(signum, _):
+        for process in processes:
+            process.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in processes:
+        process.wait()
+
+
+def runs_detection(queues):
+    """Return whether a worker listening on the queues runs the detection models."""
+    if inference_queue in queues:
+        return True
+    return not use_inference_worker and (moderation_queue in queues or legacy_queue in queues)
+
+
+def run_worker(queues):
+    worker_class = Worker
+    if runs_detection(queues) and (preload_models or inference_queue in queues):
+        from ai_utils.detect import preload_models as load_models
+
+        load_models()
+        worker_class = SimpleWorker
+    if audio_recognizer == 'vosk' and (audio_queue in queues or moderation_queue in queues):
+        from ai_utils.speech import get_recognizer
+
+        get_recognizer(audio_recognizer, vosk_model_path).load()
+        worker_class = SimpleWorker
+
     with Connection(conn):
-        worker = Worker(list(map(Queue, listen)))
+        worker = worker_class(list(map(Queue, queues)))
         worker.work()
+
+
+if __name__ == '__main__':
+    # `python redis_worker.py` starts every worker of WORKER_TOPOLOGY, while
+    # `python redis_worker.py <queue> [<queue> ...]` starts a single worker on the given queues
+    if len(sys.argv) > 1:
+        run_worker(sys.argv[1:])
+    else:
+        launch_workers(worker_topology)